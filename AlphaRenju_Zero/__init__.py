@@ -1,7 +1,20 @@
-from .agent import *
-from .dataset import *
-from .network import *
-from .ui import *
-from .config import *
-from .env import *
-from .rules import *
+from ._lazy import lazy_exports
+
+# Public names are imported from their submodule on first access, so that importing e.g. the rules or the
+# search does not pull in Keras/TensorFlow or pygame. 'from AlphaRenju_Zero import *' still loads everything.
+_exports = {
+    'Config': '.config',
+    'Env': '.env',
+    'Rules': '.rules', 'BLACK': '.rules', 'WHITE': '.rules',
+    'DataSet': '.dataset.dataset', 'GameRecord': '.dataset.dataset', 'ReplayBuffer': '.dataset.replay',
+    'ShardStore': '.dataset.shards', 'CompactRecord': '.dataset.compact',
+    'PrefetchLoader': '.dataset.loader',
+    'SelfPlayPool': '.selfplay', 'Arena': '.arena', 'OpeningBook': '.opening',
+    'Network': '.network.network', 'NumpyNetwork': '.network.numpynet', 'WeightSlot': '.network.slot',
+    'make_network': '.network', 'board2tensor': '.network.encode',
+    'Agent': '.agent.agent', 'HumanAgent': '.agent.human', 'MCTSAgent': '.agent.ai',
+    'MCTS': '.agent.mcts', 'Node': '.agent.node', 'SearchCache': '.agent.cache',
+    'Board': '.ui.board', 'Renderer': '.ui.renderer',
+}
+__all__ = list(_exports)
+__getattr__ = lazy_exports(globals(), _exports)
@@ -0,0 +1,13 @@
+import importlib
+
+
+def lazy_exports(namespace, exports):
+    """ a module-level __getattr__ for the module with globals() namespace: name is imported from the submodule
+    exports[name] (relative to the module) on first access, and kept in namespace afterwards """
+    def __getattr__(name):
+        if name in exports:
+            value = getattr(importlib.import_module(exports[name], namespace['__name__']), name)
+            namespace[name] = value
+            return value
+        raise AttributeError('module {!r} has no attribute {!r}'.format(namespace['__name__'], name))
+    return __getattr__
@@ -1,2 +1,6 @@
-from .human import HumanAgent
-from .ai import *
+from .._lazy import lazy_exports
+
+# MCTSAgent builds a network and HumanAgent needs a renderer, so nothing is imported before it is used
+_exports = {'Agent': '.agent', 'HumanAgent': '.human', 'MCTSAgent': '.ai', 'MCTS': '.mcts', 'Node': '.node'}
+__all__ = list(_exports)
+__getattr__ = lazy_exports(globals(), _exports)
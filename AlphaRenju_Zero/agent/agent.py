@@ -13,6 +13,11 @@ class Agent:
     def play(self):
         pass
 
+    def play_steps(self, *args):
+        """ play() as a generator of leaf evaluations, see MCTSAgent; an agent without a search yields none """
+        return self.play(*args)
+        yield
+
     @property
     def color(self):
         return self._color
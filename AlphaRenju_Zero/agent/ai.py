@@ -1,5 +1,7 @@
 from .agent import Agent
-from ..network.network import *
+from ..network import make_network
+from ..network.encode import boards2tensor
+import numpy as np
 import random
 from .mcts import *
 import time
@@ -43,38 +45,80 @@ class AI(Agent):
 
 
 class MCTSAgent(AI):
-    def __init__(self, conf, color):
+    def __init__(self, conf, color, network=None):
         AI.__init__(self, color)
-        network = Network(conf)
+        if network is None:
+            network = make_network(conf)
         self._mcts = MCTS(conf, network, color)
         self._network = network
         self._board_size = conf['board_size']
 
     def play(self, obs, action, stone_num):
-        act_ind, pi = self._mcts.action(obs, action, stone_num)
+        return evaluate_leaves(self.play_steps(obs, action, stone_num))
+
+    def play_steps(self, obs, action, stone_num):
+        act_ind, pi = yield from self._mcts.action_steps(obs, action, stone_num)
         act_cor = index2coordinate(act_ind, self._board_size)
         return act_cor, pi
 
     def set_self_play(self, is_self_play):
         self._mcts.set_self_play(is_self_play)
 
+    def set_search_cache(self, cache):
+        self._mcts.set_search_cache(cache)
+
     def reset_mcts(self):
         self._mcts.reset()
+
+    def root_value(self):
+        return self._mcts.root_value()
+
+    def tree_stats(self):
+        return self._mcts.tree_stats()
     
     def train(self, obs, color, pi, z):
+        self.train_batch(boards2tensor(obs, color), np.asarray(pi, dtype=np.float32), np.asarray(z, dtype=np.float32))
+
+    def train_batch(self, tensor, pi, z, weight=None):
         print('training begins:')
-        start = time.clock()
-        self._network.train(obs, color, pi, z)      # TODO
-        end = time.clock()
+        start = time.time()
+        self._network.train_batch(tensor, pi, z, weight)      # TODO
+        end = time.time()
         print('training time = ' + str(end - start))
         print('*********************************************')
+        return end - start
         
+    def train_loader(self, loader):
+        print('training begins:')
+        start = time.time()
+        self._network.train_loader(loader)
+        end = time.time()
+        stats = loader.stats()
+        print('training time = ' + str(end - start))
+        print('batches = {}, batches/s = {:.2f}, stall time = {:.3f} s ({:.1%})'.format(
+            stats['batches'], stats['batches_per_second'], stats['stall_time'], stats['stall_fraction']))
+        print('*********************************************')
+        return end - start
+
     def save_model(self):
         self._network.save_model()
 
     def load_model(self):
         self._network.load_model()
 
+    def network(self):
+        return self._network
+
+    def set_network(self, network):
+        """ let the search evaluate leaves with another network, e.g. a WeightSlot """
+        self._mcts.set_network(network)
+
+    def snapshot_model(self):
+        return self._network.snapshot()
+
+    def restore_model(self, snapshot):
+        self._network.restore(snapshot)
+
 
 
 class NNAgent(AI):
@@ -0,0 +1,120 @@
+"""
+Search statistics of early positions, kept across games and on disk.
+
+An entry holds the children of a searched root: moves (cells in the canonical orientation of the position),
+priors, visits and value sums. It is keyed by the model version and the hash of the canonical position, so it
+serves every symmetric copy of the position and never a different network. The cache holds at most capacity
+entries and drops the least recently used one first. On disk all entries are concatenated into a few arrays
+(keys, versions, offsets into the moves, priors, visits and values) in one .npz file.
+"""
+from collections import OrderedDict
+import hashlib
+import os
+from ..dataset.dedup import cell_weights, symmetry_cells, canonical_hash
+import numpy as np
+
+CACHE_VERSION = 1
+
+
+def model_version(weights):
+    """ short fingerprint of a set of weights, a list or a dict of arrays """
+    digest = hashlib.sha1()
+    for w in (weights.values() if hasattr(weights, 'values') else weights):
+        digest.update(np.ascontiguousarray(w).tobytes())
+    return digest.hexdigest()[:16]
+
+
+class SearchCache:
+    """Warm starts for the roots of MCTS.
+
+    plies: only positions with fewer stones are cached; reuse: share of the simulations of a search that a
+    cached root stands for (its visits are scaled to it), the search then runs the rest.
+    """
+    def __init__(self, board_size, capacity, plies, reuse, path=None):
+        self._board_size = board_size
+        self._capacity = capacity
+        self._plies = plies
+        self._reuse = reuse
+        self._path = path
+        self._weights = cell_weights(board_size)
+        self._source = symmetry_cells(board_size)
+        self._version = ''
+        self._entries = OrderedDict()  # (version, key) -> (cells, priors, visits, values), least recent first
+        self._lookups = 0
+        self._hits = 0
+        self._simulations_saved = 0
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def set_version(self, version):
+        """ the model version of the following lookups and stores, see model_version; other versions are dropped """
+        if version != self._version:
+            self._entries = OrderedDict((entry_key, entry) for entry_key, entry in self._entries.items()
+                                        if entry_key[0] == version)
+        self._version = version
+
+    def covers(self, stone_num):
+        return stone_num < self._plies
+
+    def get(self, board, simulation_times):
+        """ the root of board as (moves, priors, visits, values), visits scaled to reuse * simulation_times """
+        self._lookups += 1
+        key, k = canonical_hash(board, self._weights)
+        entry = self._entries.get((self._version, key))
+        if entry is None:
+            return None
+        self._entries.move_to_end((self._version, key))
+        cells, priors, visits, values = entry
+        scale = self._reuse * simulation_times / max(np.sum(visits), 1)
+        q = values / np.maximum(visits, 1)
+        visits = np.rint(visits * scale)
+        return self._source[k][cells], priors, visits, q * visits
+
+    def put(self, board, moves, priors, visits, values):
+        """ store the searched root of board: its moves (cells of board), priors, visits and value sums """
+        key, k = canonical_hash(board, self._weights)
+        cells = np.argsort(self._source[k])[np.asarray(moves, dtype=np.int64)]
+        self._entries[(self._version, key)] = (cells.astype(np.int16), np.asarray(priors, dtype=np.float16),
+                                               np.asarray(visits, dtype=np.float32),
+                                               np.asarray(values, dtype=np.float32))
+        self._entries.move_to_end((self._version, key))
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+
+    def add_hit(self, simulations):
+        """ count a looked up entry that a search started from, standing for simulations """
+        self._hits += 1
+        self._simulations_saved += simulations
+
+    def stats(self):
+        return {'entries': len(self._entries), 'lookups': self._lookups, 'hits': self._hits,
+                'hit_rate': self._hits / max(self._lookups, 1), 'simulations_saved': self._simulations_saved}
+
+    def save(self):
+        if self._path is None:
+            return
+        items = list(self._entries.items())
+        versions = sorted(set(version for (version, key), entry in items))
+        fields = [np.concatenate([entry[i] for key, entry in items]) if items else np.zeros(0) for i in range(4)]
+        tmp_file = self._path + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, format=np.array([CACHE_VERSION, self._board_size]), versions=np.array(versions, dtype=str),
+                     keys=np.array([key for (version, key), entry in items], dtype=np.uint64),
+                     version_ids=np.array([versions.index(version) for (version, key), entry in items],
+                                          dtype=np.int32),
+                     offsets=np.cumsum([0] + [len(entry[0]) for key, entry in items]).astype(np.int64),
+                     cells=fields[0].astype(np.int16), priors=fields[1].astype(np.float16),
+                     visits=fields[2].astype(np.float32), values=fields[3].astype(np.float32))
+        os.replace(tmp_file, self._path)
+
+    def load(self):
+        with np.load(self._path) as data:
+            if list(data['format']) != [CACHE_VERSION, self._board_size]:
+                return  # written for another board size or format, it is overwritten by the next save
+            offsets = data['offsets']
+            fields = [data['cells'], data['priors'], data['visits'], data['values']]
+            for i, (key, version_id) in enumerate(zip(data['keys'], data['version_ids'])):
+                self._entries[(str(data['versions'][version_id]), int(key))] = tuple(
+                    field[offsets[i]:offsets[i + 1]] for field in fields)
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
@@ -1,77 +1,234 @@
-from .node import Node
+from .node import Node, NODE_BYTES
+import random
 import numpy as np
 from ..rules import *
 
 
+# share of tree_max_nodes a tree is cut back to when it outgrows the budget
+EVICT_TO = 0.75
+
+
 class MCTS:
     def __init__(self, conf, net, color):
         """Hyperparameters"""
         self._c_puct = conf['c_puct']  # PUCT
         self._simulation_times = conf['simulation_times']  # number of simulation
+        # playout cap randomization: in self-play only a random share of the moves get the full search
+        self._playout_cap = conf['playout_cap']
+        self._fast_simulation_times = conf['fast_simulation_times']
+        self._full_search_rate = conf['full_search_rate']
         self._tau = conf['initial_tau']  # temperature parameter
         self._careful_stage = conf['careful_stage']  # the stage after which we set tau to zero
         self._epsilon = conf['epsilon']  # proportion of dirichlet noise
         self._dirichlet = conf['dirichlet']
+        # root policy: 'visits' (PUCT search, move from the visit counts) or 'gumbel' (see _gumbel_steps)
+        self._root_policy = conf['root_policy']
+        self._gumbel_k = conf['gumbel_k']
+        self._gumbel_c_visit = conf['gumbel_c_visit']
+        self._gumbel_c_scale = conf['gumbel_c_scale']
         self._board_size = conf['board_size']
         self._color = color  # MCTS Agent's color ( 1 for black; -1 for white)
         """Monte Carlo Tree"""
         self._root = Node(1.0, None, BLACK)
+        self._root_value = 0  # value of the last searched root for the player to move
         """Convolutional Residual Neural Network"""
         self._network = net
         self._is_self_play = conf['is_self_play']
+        self._search_cache = None  # warm starts of the early self-play roots, see SearchCache
+        self._max_nodes = conf['tree_max_nodes']
+        self._evicted = 0  # nodes released to stay within tree_max_nodes
 
     def set_self_play(self, is_self_play):
         self._is_self_play = is_self_play
 
+    def set_network(self, net):
+        self._network = net
+
+    def set_search_cache(self, cache):
+        self._search_cache = cache
+
     def reset(self):
-        self._root = Node(1.0, None, BLACK)
+        self._set_root(Node(1.0, None, BLACK))
+
+    def _set_root(self, node):
+        # the old tree is released at once, except node when it was part of it (see Node.remove_child)
+        self._root.release(discard=True)
+        self._root = node
+
+    def tree_stats(self):
+        """ size of the search tree, for monitoring """
+        return {'nodes': self._root.size(), 'bytes': self._root.size() * NODE_BYTES, 'evicted': self._evicted,
+                'live_nodes': Node.live}
     
     def action(self, board, last_action, stage):  # Note that this function is open to the environment.
+        return evaluate_leaves(self.action_steps(board, last_action, stage))
+
+    def action_steps(self, board, last_action, stage):
+        """action() as a generator: it yields every leaf to evaluate as (network, board, color), receives
+        (indices, priors, value) for it, and returns (action, pi). See evaluate_leaves and lockstep.py.
+        pi is None after a fast search, which must not be used as a policy target."""
+
+        full_search = not (self._is_self_play and self._playout_cap) or random.random() < self._full_search_rate
+        simulation_times = self._simulation_times if full_search else self._fast_simulation_times
+
+        # the cached root of board is looked up first, so that a new tree starts from it instead of a search
+        cached = self._search_cache is not None and self._is_self_play and self._search_cache.covers(stage)
+        entry = self._search_cache.get(board, simulation_times) if cached else None
+
         """Adjust the Root Node corresponding to the latest enemy action"""
 
-        # the root corresponds to the last board = board - last_action
-        if self._root.is_leaf():
-            last_board = np.copy(board)
+        if self._root.is_leaf() and entry is not None and np.sum(entry[2]) > 0:
+            simulation_times = self._warm_start(board, entry, simulation_times)
+        else:
+            # the root corresponds to the last board = board - last_action
+            if self._root.is_leaf():
+                last_board = np.copy(board)
+                if last_action is not None:
+                    row, col = last_action[0], last_action[1]
+                    last_board[row][col] = 0
+                # a new tree, e.g. for a game that starts from a book position: black moves when the stones are even
+                self._set_root(Node(1.0, None, BLACK if np.sum(last_board) == 0 else WHITE))
+                yield from self._simulate(last_board, simulation_times)
+
+            # now move the root to the child corresponding to the board
             if last_action is not None:
-                row, col = last_action[0], last_action[1]
-                last_board[row][col] = 0
-            self._simulate(last_board)
-
-        # now move the root to the child corresponding to the board
-        if last_action is not None:
-            last_action_ind = coordinate2index(last_action, self._board_size)
-            self._root = self._root.children()[last_action_ind]
-
-        # must check whether the root is a leaf node before prediction
-        pi = self._predict(board)
-        """Action Decision"""
-        if stage <= self._careful_stage:  # Uncareful Stage where optimal action may not be taken
-            position_list = [i for i in range(self._board_size * self._board_size)]
-            action = np.random.choice(position_list, p=pi)
-        else:  # Careful Stage where we play optimally
-            action = np.argmax(pi)
+                last_action_ind = coordinate2index(last_action, self._board_size)
+                self._set_root(self._root.remove_child(last_action_ind))
+
+            if entry is not None:
+                simulation_times = self._warm_start(board, entry, simulation_times)
+
+        if self._root_policy == 'gumbel':
+            action, pi = yield from self._gumbel_steps(board, stage, simulation_times)
+        else:
+            # must check whether the root is a leaf node before prediction
+            pi = yield from self._predict(board, simulation_times)
+            """Action Decision"""
+            if stage <= self._careful_stage:  # Uncareful Stage where optimal action may not be taken
+                position_list = [i for i in range(self._board_size * self._board_size)]
+                action = np.random.choice(position_list, p=pi)
+            else:  # Careful Stage where we play optimally
+                action = np.argmax(pi)
         """Adjust the Root Node and discard the remainder of the tree"""
         if not self._is_self_play:
-            self._root = self._root.children()[action]
+            self._set_root(self._root.remove_child(action))
+        if cached:
+            children = self._root.children()
+            self._search_cache.put(board, list(children), [node.P() for node in children.values()],
+                                   [node.N() for node in children.values()],
+                                   [node.N() * node.Q() for node in children.values()])
+        if not full_search:
+            pi = None
         return action, pi  # You need to store pi for training use
     
-    def _predict(self, board):
-        self._simulate(board)
-        pi = np.array([(node.N())**(1/self._tau) for node in self._root.children()])
+    def _warm_start(self, board, entry, simulation_times):
+        """ take the cached root of board when it has more visits than the current one, return the simulations to run """
+        moves, priors, visits, values = entry
+        if np.sum(visits) <= self._root.N():
+            return simulation_times
+        root = Node(1.0, None, BLACK if np.sum(board) == 0 else WHITE)
+        root.expand(moves, priors)
+        for move, n, w in zip(moves, visits, values):
+            root.children()[int(move)].warm(n, w)
+        # the Q of the root is seen from the player who moved there
+        root.warm(np.sum(visits), -np.sum(values))
+        self._set_root(root)
+        self._search_cache.add_hit(int(np.sum(visits)))
+        return max(simulation_times - int(np.sum(visits)), 0)
+
+    def _predict(self, board, simulation_times):
+        yield from self._simulate(board, simulation_times)
+        pi = np.zeros(self._board_size * self._board_size)
+        for action, node in self._root.children().items():
+            pi[action] = (node.N())**(1/self._tau)
         pi = pi/sum(pi)
+        self._update_root_value()
         return pi
+
+    def _gumbel_steps(self, board, stage, simulation_times):
+        """Root policy of Gumbel MuZero (Danihelka et al., 2022) for small simulation budgets.
+
+        The gumbel_k moves with the largest prior logit + Gumbel noise are searched by sequential halving: every
+        phase spreads its share of the simulations evenly over the remaining moves (the first move below the root
+        is forced, the tree below uses PUCT) and keeps the better half by logit + noise + sigma(Q). The move left
+        over is played, and pi is the improved policy softmax(logit + sigma(completed Q)) instead of the visit
+        counts. Without noise after the careful stage, the move is the best one of the search.
+        """
+        if self._root.is_leaf():
+            yield from self._simulate(board, 1)
+            simulation_times -= 1
+        children = self._root.children()
+        actions = np.array(list(children))
+        logits = np.log(np.array([children[a].P() for a in actions], dtype=np.float64) + 1e-12)
+        if stage <= self._careful_stage:
+            gumbel = np.random.gumbel(size=len(actions))
+        else:
+            gumbel = np.zeros(len(actions))
+        considered = min(self._gumbel_k, len(actions), max(simulation_times, 1))
+        remaining = list(np.argsort(-(gumbel + logits))[:considered])
+        phases = max(1, int(np.ceil(np.log2(considered))))
+        budget = simulation_times
+        while budget > 0:
+            visits = max(1, simulation_times // (phases * len(remaining)))
+            for i in remaining:
+                n = min(visits, budget)
+                yield from self._simulate(board, n, actions[i])
+                budget -= n
+            if len(remaining) > 1:
+                scores = gumbel + logits + self._sigma(self._completed_q(actions, logits))
+                remaining = sorted(remaining, key=lambda i: -scores[i])[:max(1, len(remaining) // 2)]
+        scores = gumbel + logits + self._sigma(self._completed_q(actions, logits))
+        action = actions[max(remaining, key=lambda i: scores[i])]
+
+        improved = logits + self._sigma(self._completed_q(actions, logits))
+        improved = np.exp(improved - np.max(improved))
+        pi = np.zeros(self._board_size * self._board_size)
+        pi[actions] = improved / np.sum(improved)
+        self._update_root_value()
+        return action, pi
+
+    def _completed_q(self, actions, logits):
+        """ Q of every root move for the player at the root, the unvisited ones get the mixed value estimate """
+        children = self._root.children()
+        visits = np.array([children[a].N() for a in actions], dtype=float)
+        q = np.array([children[a].Q() for a in actions])
+        visited = visits > 0
+        value = -self._root.Q()  # the value of the root for the player to move
+        if np.any(visited):
+            priors = np.exp(logits)
+            weighted_q = np.sum(priors[visited] * q[visited]) / np.sum(priors[visited])
+            value = (value + np.sum(visits) * weighted_q) / (1 + np.sum(visits))
+        return np.where(visited, q, value)
+
+    def _sigma(self, q):
+        # q is rescaled to [0, 1] over the root moves and grows in weight with the visits of the most visited move
+        q = (q - np.min(q)) / max(np.max(q) - np.min(q), 1e-8)
+        max_visits = max(node.N() for node in self._root.children().values())
+        return (self._gumbel_c_visit + max_visits) * self._gumbel_c_scale * q
+
+    def _update_root_value(self):
+        # the Q of a child is the value of its move for the player at the root
+        visits = sum(node.N() for node in self._root.children().values())
+        self._root_value = sum(node.N() * node.Q() for node in self._root.children().values()) / max(visits, 1)
+
+    def root_value(self):
+        """ the search value of the last position played from, for the player who moved there """
+        return self._root_value
     
-    def _simulate(self, root_board):    # ROOT BOARD MUST CORRESPOND TO THE ROOT NODE!!!
-        legal_vec_root = board2legalvec(root_board)
-        for epoch in range(self._simulation_times):
+    def _simulate(self, root_board, simulation_times, first_action=None):    # ROOT BOARD MUST CORRESPOND TO THE ROOT NODE!!!
+        """ first_action: the move every simulation takes at the root, instead of the PUCT choice """
+        for epoch in range(simulation_times):
+            if self._max_nodes is not None and self._root.size() > self._max_nodes:
+                self._evict()
             current_node = self._root
-            legal_vec_current = np.copy(legal_vec_root)  # deep copy
             current_color = self._root.color
             current_board = np.copy(root_board)
             action = None
             while not current_node.is_leaf():
-                current_node, action = current_node.select(self._c_puct, legal_vec_current)
-                legal_vec_current[action] = 0
+                if current_node is self._root and first_action is not None:
+                    current_node, action = current_node.children()[first_action], first_action
+                else:
+                    current_node, action = current_node.select(self._c_puct)
                 row, col = index2coordinate(action, self._board_size)
                 current_board[row][col] = current_color
                 current_color = -current_color
@@ -81,9 +238,8 @@ class MCTS:
                 current_node.backup(-current_node.value)
                 continue
 
-            # calculate the prior probabilities and value
-            p, v = self._network.predict(current_board, current_color)
-            prior_prob = p[0]
+            # calculate the prior probabilities of the legal moves and value
+            actions, priors, v = yield self._network, current_board, current_color
 
             # now check whether this leaf node is an end node
             if action is not None:
@@ -93,13 +249,40 @@ class MCTS:
                     current_node.end_reason = end_flag
                     current_node.value = -v
                 else:
-                    current_node.expand(prior_prob, self._board_size)
+                    current_node.expand(actions, priors)
             else:
                 # if action is None, then the root node is a leaf
-                current_node.expand(prior_prob, self._board_size)
+                current_node.expand(actions, priors)
             current_node.backup(-v)
 
 
+    def _evict(self):
+        """ collapse the least visited subtrees below the root until the tree is back to EVICT_TO of the budget """
+        expanded = []
+        stack = list(self._root.children().values())
+        while stack:
+            node = stack.pop()
+            if not node.is_leaf():
+                expanded.append(node)
+                stack.extend(node.children().values())
+        expanded.sort(key=lambda node: node.N())
+        for node in expanded:
+            if self._root.size() <= EVICT_TO * self._max_nodes:
+                break
+            if node.parent() is not None:  # else it was released with a collapsed ancestor
+                self._evicted += node.release()
+
+
+def evaluate_leaves(steps):
+    """ run a search generator (e.g. MCTS.action_steps) to the end, one network call per leaf; return its result """
+    try:
+        network, board, color = next(steps)
+        while True:
+            network, board, color = steps.send(network.predict_legal(board, color))
+    except StopIteration as stop:
+        return stop.value
+
+
 def index2coordinate(index, size):
     row = index // size
     col = index % size
@@ -1,9 +1,18 @@
 from math import sqrt
+import sys
+from types import MappingProxyType
 import numpy as np
 
+# the children of every leaf: read-only, so that leaves need no dict of their own
+NO_CHILDREN = MappingProxyType({})
+
 
 class Node:
-    count = 0
+    # no per-instance __dict__: a 15x15 tree holds hundreds of thousands of nodes
+    __slots__ = ['_N', '_Q', '_W', '_P', '_U', '_parent', '_children', '_size', 'is_end', 'end_reason', 'value',
+                 'color']
+    count = 0  # nodes created
+    live = 0  # nodes created and not released yet
     def __init__(self, prior_prob, parent, color):
         
         """Information of the edge that leads to this node"""
@@ -15,7 +24,8 @@ class Node:
         
         """parent and children nodes"""
         self._parent = parent  # the parent node
-        self._children = []  # Empty list since it is not explored yet
+        self._children = NO_CHILDREN  # action -> child, only legal actions; empty since it is not explored yet
+        self._size = 1  # nodes of the subtree
 
         # when it is an end leaf
         self.is_end = False
@@ -23,8 +33,8 @@ class Node:
         self.value = 0
 
         self.color = color  # color of next player
-        self.num = Node.count
         Node.count += 1
+        Node.live += 1
 
     def N(self):
         return self._N
@@ -32,6 +42,15 @@ class Node:
     def Q(self):
         return self._Q
 
+    def P(self):
+        return self._P
+
+    def warm(self, visits, value_sum):
+        """ start from the statistics of an earlier search, see SearchCache """
+        self._N = visits
+        self._W = value_sum
+        self._Q = value_sum / visits if visits > 0 else 0
+
     def U(self):
         return self._U
 
@@ -45,30 +64,73 @@ class Node:
         return self._parent is None
     
     def is_leaf(self):
-        return self._children == []
+        return not self._children
+
+    def size(self):
+        return self._size
     
     def upper_confidence_bound(self, c_puct):
         self._U = c_puct * self._P * sqrt(self._parent.N())/(1+self._N)
         return self._U + self._Q
     
-    def select(self, c_puct, legal_vec_current):
-        ucb_list = np.array([node.upper_confidence_bound(c_puct) for node in self._children])
-        ind = np.argsort(ucb_list)
-        for i in range(len(ind)):
-            if legal_vec_current[ind[-(i+1)]] == 1:
-                action = ind[-(i+1)]
-                break
-        next_node = self._children[action]
-        return next_node, action
+    def select(self, c_puct):
+        # every child is a legal action, so there is nothing to skip
+        action = max(self._children, key=lambda a: self._children[a].upper_confidence_bound(c_puct))
+        return self._children[action], action
         
-    def expand(self, prior_prob, board_size=15):
-        for i in range(board_size*board_size):
-            prob = prior_prob[i]
-            self._children.append(Node(prob, self, -self.color))
+    def expand(self, actions, priors):
+        children = dict(self._children)
+        for action, prob in zip(actions, priors):
+            children[int(action)] = Node(prob, self, -self.color)
+        self._children = children
+        node = self
+        while node is not None:
+            node._size += len(self._children)
+            node = node._parent
+
+    def remove_child(self, action):
+        """ take the child of action with its subtree out of the tree, it becomes a root """
+        child = self._children.pop(action)
+        child._parent = None
+        node = self
+        while node is not None:
+            node._size -= child._size
+            node = node._parent
+        return child
+
+    def release(self, discard=False):
+        """Drop the subtree below this node at once, return the number of nodes released.
+
+        Parent and children refer to each other, so a discarded subtree would otherwise wait for the cyclic
+        garbage collector. The statistics of this node stay and it is a leaf again, unless discard is set
+        because the node itself is no longer used either.
+        """
+        released = 0
+        stack = list(self._children.values())
+        while stack:
+            node = stack.pop()
+            stack.extend(node._children.values())
+            node._children = NO_CHILDREN
+            node._parent = None
+            released += 1
+        self._children = NO_CHILDREN
+        node = self
+        while node is not None:
+            node._size -= released
+            node = node._parent
+        Node.live -= released
+        if discard:
+            self._parent = None
+            Node.live -= 1
+        return released
 
     def backup(self, value):
         self._N += 1
         self._W += value
         self._Q = self._W / self._N
         if not self.is_root():
-            self._parent.backup(-value)
\ No newline at end of file
+            self._parent.backup(-value)
+
+
+# rough bytes of a node in a tree: the object, its float statistics and its entry in the children dict of the parent
+NODE_BYTES = Node.__basicsize__ + 3 * sys.getsizeof(0.5) + sys.getsizeof(dict.fromkeys(range(225))) // 225
@@ -0,0 +1,136 @@
+import multiprocessing as mp
+from math import log
+import random
+import traceback
+from .selfplay import start_processes, worker_config
+import numpy as np
+
+
+def match_score(wins, draws):
+    """ score of a side over a match: a draw counts as half a win, on every evaluation path """
+    return wins + draws / 2
+
+
+def sprt(score, games, p0, p1, alpha, beta):
+    """Sequential probability ratio test of the expected score of a candidate.
+
+    score: match_score of the games so far. H0: the expected score per game is p0, H1: it is p1 > p0.
+    Returns 'accept' (H1) or 'reject' (H0) as soon as the log likelihood ratio of the games so far crosses a
+    bound, which keeps the error rates at about alpha and beta, and None while the games are not conclusive.
+    A draw counts as half a win and half a loss, the usual Bernoulli approximation of a trinomial test.
+    """
+    llr = score * log(p1 / p0) + (games - score) * log((1 - p1) / (1 - p0))
+    if llr >= log((1 - beta) / alpha):
+        return 'accept'
+    if llr <= log(beta / (1 - alpha)):
+        return 'reject'
+    return None
+
+
+def _arena_worker(conf, seed, tasks, results):
+    """ body of an arena process: one headless Env with the NumPy backend, one game per task """
+    try:
+        from .env import Env
+        random.seed(seed)
+        np.random.seed(seed)
+        env = Env(conf)
+        loaded = None
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            match, candidate_file, best_file, new_model_black, opening_seed = task
+            if match != loaded:
+                env.load_arena(candidate_file, best_file)
+                loaded = match
+            results.put((match, env.arena_game(new_model_black, opening_seed)))
+    except Exception:
+        results.put((None, traceback.format_exc()))
+
+
+class Arena:
+    """Plays the evaluation games of a candidate against the best model in worker processes.
+
+    Both models are read from flat weight files. At most one game per worker is in flight, the candidate takes
+    black in every other game, and both games of such a pair start with the same book moves when
+    conf['opening_book'] is set. With conf['sprt'] the match stops as soon as the SPRT between the expected scores
+    conf['sprt_p0'] and conf['sprt_p1'] is conclusive; otherwise, or when all games_num games are played
+    without a conclusion, the candidate is adopted with a score (draws count half) above 0.55.
+    """
+    def __init__(self, conf, workers, seed=None):
+        self._ctx = mp.get_context('spawn')
+        self._conf = conf
+        self._workers_num = workers
+        self._seed = random.randrange(2 ** 31) if seed is None else seed
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._processes = []
+        self._match = 0
+        self._started = 0  # games of the current match handed to the workers
+        self._games_saved = 0
+        self._decisions = 0
+
+    def start(self):
+        conf = worker_config(self._conf, self._conf['net_flat_file'])
+        self._processes = start_processes(self._ctx, _arena_worker, [
+            (conf, self._seed + i, self._tasks, self._results) for i in range(self._workers_num)])
+        return self
+
+    def play(self, candidate_file, best_file, games_num):
+        """ gate the candidate: returns a dict with adopted, wins, draws, games (finished), games_saved and reason """
+        conf = self._conf
+        finished, wins, draws = 0, 0, 0
+        decision = None
+        games = self._games(candidate_file, best_file, games_num)
+        for result in games:
+            finished += 1
+            wins += result == 1
+            draws += result == 0
+            if conf['sprt']:
+                decision = sprt(match_score(wins, draws), finished, conf['sprt_p0'], conf['sprt_p1'],
+                                conf['sprt_alpha'], conf['sprt_beta'])
+                if decision is not None:
+                    break
+        reason = 'sprt'
+        if decision is None:
+            decision = 'accept' if match_score(wins, draws) / games_num > 0.55 else 'reject'
+            reason = 'score'
+        # the games already started are played out, but only the games never started are saved
+        saved = games_num - self._started
+        self._games_saved += saved
+        self._decisions += 1
+        return {'adopted': decision == 'accept', 'wins': wins, 'draws': draws, 'games': finished, 'games_saved': saved,
+                'reason': reason}
+
+    def match(self, first_file, second_file, games_num):
+        """ play all games_num games: wins of the first model, wins of the second, draws """
+        results = list(self._games(first_file, second_file, games_num))
+        return results.count(1), results.count(-1), results.count(0)
+
+    def _games(self, candidate_file, best_file, games_num):
+        """ generator of the results of a new match, in the order the games finish """
+        self._match += 1
+        self._started, finished = 0, 0
+        while finished < games_num:
+            while self._started < games_num and self._started - finished < self._workers_num:
+                self._tasks.put((self._match, candidate_file, best_file, self._started % 2 == 0,
+                                 [self._seed, self._match, self._started // 2]))
+                self._started += 1
+            match, result = self._results.get()
+            if match is None:
+                raise RuntimeError('arena worker failed:\n' + result)
+            if match != self._match:
+                continue  # a game of an earlier match that stopped early
+            finished += 1
+            yield result
+
+    def stats(self):
+        return {'decisions': self._decisions, 'games_saved': self._games_saved,
+                'games_saved_per_decision': self._games_saved / max(self._decisions, 1)}
+
+    def close(self):
+        for process in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join()
+        self._processes = []
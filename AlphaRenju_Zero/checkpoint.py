@@ -0,0 +1,94 @@
+"""
+Checkpoints of the whole training state, see Env.state.
+
+directory/state_<epoch>.pkl   one pickled state per checkpoint, named after the number of finished epochs
+
+A state is written to a temporary file, synced and renamed, so a state file either holds a complete state or
+does not exist; resuming takes the newest one that can be read.
+"""
+import os
+import pickle
+import queue
+import threading
+
+FORMAT_VERSION = 1
+
+
+def write_state(directory, epoch, state):
+    path = os.path.join(directory, 'state_{:06d}.pkl'.format(epoch))
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(dict(state, format_version=FORMAT_VERSION), f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+    return path
+
+
+def state_files(directory):
+    """ the state files of directory, newest first """
+    if not os.path.isdir(directory):
+        return []
+    names = sorted((name for name in os.listdir(directory) if name.startswith('state_') and name.endswith('.pkl')),
+                   reverse=True)
+    return [os.path.join(directory, name) for name in names]
+
+
+def latest_state(directory):
+    """ the newest readable state of directory, None if there is none """
+    for path in state_files(directory):
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            print('skipping unreadable checkpoint {}: {}'.format(path, e))
+            continue
+        if state.get('format_version', 0) > FORMAT_VERSION:
+            raise ValueError('unsupported checkpoint version: ' + str(state['format_version']))
+        return state
+    return None
+
+
+class CheckpointWriter:
+    """Writes states in a background thread and keeps the newest `keep` of them.
+
+    save() only queues the state, which must already be a copy (see Env.state); it blocks only while the
+    previous state is still being written, so at most one state waits in memory.
+    """
+    def __init__(self, directory, keep=3):
+        self._directory = directory
+        self._keep = keep
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._queue = queue.Queue(maxsize=1)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def save(self, epoch, state):
+        self._check()
+        self._queue.put((epoch, state))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                epoch, state = item
+                write_state(self._directory, epoch, state)
+                for path in state_files(self._directory)[self._keep:]:
+                    os.remove(path)
+            except Exception as e:
+                self._error = e
+
+    def _check(self):
+        if self._error is not None:
+            raise RuntimeError('writing a checkpoint failed: ' + str(self._error))
+
+    def close(self):
+        """ wait for the queued state to be written """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._check()
@@ -3,6 +3,9 @@ class Config(dict):
         # screen size of renderer
         self['screen_size'] = (720, 720)
 
+        # no window: pygame is never imported and the game loop never waits for a repaint
+        self['headless'] = False
+
         # self play mode
         self['is_self_play'] = True
 
@@ -15,6 +18,23 @@ class Config(dict):
         # simulation times
         self['simulation_times'] = 10
 
+        # playout cap randomization in self-play: a move gets the full search with probability full_search_rate
+        # and is recorded as a policy target, the other moves get fast_simulation_times and are only played
+        self['playout_cap'] = False
+        self['fast_simulation_times'] = 3
+        self['full_search_rate'] = 0.25
+
+        # root policy of the search: 'visits' picks the move from the visit counts of the PUCT search (with tau),
+        # 'gumbel' searches the gumbel_k most promising moves by sequential halving and trains on an improved
+        # policy, which needs far fewer simulations; gumbel_c_visit and gumbel_c_scale weigh Q against the prior
+        self['root_policy'] = 'visits'
+        self['gumbel_k'] = 8
+        self['gumbel_c_visit'] = 50
+        self['gumbel_c_scale'] = 0.1
+
+        # largest search tree in nodes (None: unbounded); a larger tree loses its least visited subtrees
+        self['tree_max_nodes'] = None
+
         # initial tau
         self['initial_tau'] = 1
 
@@ -36,9 +56,147 @@ class Config(dict):
         # sample percentage
         self['sample_percentage'] = 0.5
         
+        # number of positions kept by the replay buffer across epochs
+        self['replay_capacity'] = 50000
+
+        # sample from the newest replay_window positions only (None: the whole buffer)
+        self['replay_window'] = None
+
+        # how training samples are drawn from the replay: 'uniform', 'recency' or 'priority' (in-memory only,
+        # proportional to the loss of a position when it was last trained on; not with dedup or prefetch_depth > 0)
+        self['sample_weighting'] = 'uniform'
+
+        # 'recency' weighting: the weight of a position halves every this many newer positions
+        self['recency_half_life'] = 10000
+
+        # merge training samples that are the same position up to symmetry, weighted by their count
+        # (on the one full batch, so it cannot be combined with prefetch_depth > 0)
+        self['dedup'] = False
+
+        # directory of the on-disk replay store (None: keep the replay buffer in memory only)
+        self['replay_dir'] = None
+
+        # positions per shard of the on-disk replay store
+        self['shard_size'] = 4096
+
+        # retention of the on-disk replay store: keep at most this many shards (None: no limit)
+        self['replay_max_shards'] = None
+
+        # retention of the on-disk replay store: drop shards not written for this many seconds (None: no limit)
+        self['replay_max_age'] = None
+
+        # record self-play games as move lists with sparse pi (CompactRecord) instead of a board per move
+        self['compact_records'] = False
+
+        # number of pi entries kept per move by a compact record
+        self['record_top_k'] = 8
+
+        # self-play games end by resignation once a player's search value stays below resign_threshold
+        # for resign_moves consecutive moves of its own
+        self['resign'] = False
+        self['resign_threshold'] = -0.9
+        self['resign_moves'] = 3
+
+        # share of the self-play games that never resign, they calibrate resign_threshold
+        self['resign_holdout'] = 0.1
+
+        # resign_threshold is set so that at most this share of the holdout games would have resigned wrongly
+        self['resign_false_positive'] = 0.05
+
+        # the calibrated resign_threshold never exceeds this value
+        self['resign_threshold_max'] = -0.5
+
+        # opening book (e.g. 'AlphaRenju_Zero/opening.txt', 15x15 positions): a share opening_rate of the self-play
+        # and evaluation games starts with book moves played without search, up to a random book position in a
+        # random orientation ('position') or along random book moves from the empty board ('moves')
+        self['opening_book'] = None
+        self['opening_mode'] = 'position'
+        self['opening_rate'] = 0.5
+
+        # binary index of the opening book, rebuilt when the book changes
+        self['opening_cache_file'] = 'AlphaRenju_Zero/opening.npz'
+
+        # the roots of the self-play searches with fewer than search_cache_plies stones are cached per model version
+        # (at most search_cache_size of them) and warm-start the same positions in later games: a cached root
+        # stands for search_cache_reuse of the simulations, only the rest are run
+        self['search_cache'] = False
+        self['search_cache_size'] = 20000
+        self['search_cache_plies'] = 4
+        self['search_cache_reuse'] = 0.5
+
+        # the search cache is kept here between runs (None: in memory only). Entries only serve the weights that
+        # searched them, so the file helps a run that starts with the same weights, not one resumed after a
+        # learning step. Self-play workers keep an in-memory cache each, reported through the pool.
+        self['search_cache_file'] = 'AlphaRenju_Zero/network/model/search_cache.npz'
+
         # number of games in each training epoch
         self['games_num'] = 2
 
+        # self-play worker processes, each keeps a NumPy copy of the network (0: play in the training process)
+        self['workers'] = 0
+
+        # seed of the first self-play worker, worker i uses seed + i (None: random)
+        self['seed'] = None
+
+        # run self-play actors (needs workers > 0), the learner and the evaluator concurrently instead of in turn
+        self['pipeline'] = False
+
+        # flat weight file of the candidate handed from the learner to the evaluator of the pipeline
+        self['candidate_flat_file'] = 'AlphaRenju_Zero/network/model/candidate.arzw'
+
+        # arena processes for the evaluation games (0: play them in this process)
+        self['arena_workers'] = 0
+
+        # stop the arena games as soon as a sequential probability ratio test between the expected scores (a draw
+        # is half a win) sprt_p0 (reject) and sprt_p1 (accept) is conclusive, with error rates sprt_alpha and sprt_beta
+        self['sprt'] = True
+        self['sprt_p0'] = 0.5
+        self['sprt_p1'] = 0.6
+        self['sprt_alpha'] = 0.05
+        self['sprt_beta'] = 0.05
+
+        # directory of the Elo ladder that keeps every adopted model (None: no ladder)
+        self['ladder_dir'] = None
+
+        # games of one ladder match
+        self['ladder_games'] = 10
+
+        # ladder matches scheduled after each adoption, where the ratings are the most uncertain
+        self['ladder_matches'] = 2
+
+        # directory of the training checkpoints (None: no checkpoints)
+        self['checkpoint_dir'] = None
+
+        # write a checkpoint after every this many epochs
+        self['checkpoint_every'] = 1
+
+        # number of checkpoints kept
+        self['checkpoint_keep'] = 3
+
+        # continue from the newest checkpoint in checkpoint_dir
+        self['resume'] = False
+
+        # self-play workers send their leaves to one inference server process instead of keeping a network each
+        self['inference_server'] = False
+
+        # the inference server evaluates at most this many leaves at once (None: one per worker)
+        self['server_max_batch'] = None
+
+        # seconds the first leaf of a batch may wait for more leaves
+        self['server_max_wait'] = 0.002
+
+        # games advanced together in this process, their leaves evaluated in one batch (1: one game at a time)
+        self['lockstep_games'] = 1
+
+        # passes over the sampled training data in each epoch
+        self['train_epochs'] = 20
+
+        # prefetch this many augmented mini-batches in a background thread (0: train on one full batch)
+        self['prefetch_depth'] = 0
+
+        # mini-batch size when training from the prefetching loader
+        self['batch_size'] = 256
+
         # learning rate
         self['learning_rate'] = 2e-3
 
@@ -51,6 +209,21 @@ class Config(dict):
         # path of network parameters
         self['net_para_file'] = 'AlphaRenju_Zero/network/model/model.h5'
         
+        # path of the flat, memory-mappable copy of the network parameters
+        self['net_flat_file'] = 'AlphaRenju_Zero/network/model/model.arzw'
+
+        # flat weight file through which the self-play workers receive the weights being trained
+        self['selfplay_flat_file'] = 'AlphaRenju_Zero/network/model/selfplay.arzw'
+
+        # 'keras': trainable network; 'numpy': inference only, read from net_flat_file without Keras
+        self['backend'] = 'keras'
+
+        # inference precision of the numpy backend: 'float32', 'float16' or 'int8'
+        self['inference'] = 'float32'
+
+        # activation scales of the int8 inference, written by QuantizedNetwork.save_scales
+        self['quant_scale_file'] = 'AlphaRenju_Zero/network/model/int8_scales.json'
+
         # use previous model
         self['use_previous_model'] = False
 
@@ -1 +1,6 @@
 from .dataset import *
+from .replay import *
+from .shards import *
+from .compact import *
+from .dedup import *
+from .loader import *
@@ -0,0 +1,146 @@
+import numpy as np
+
+
+class CompactRecord:
+    """Game record that keeps the move list instead of a board per move.
+
+    Per ply it stores the move (int16), the color (int8) and the top_k entries of pi as (action, count) pairs,
+    where pi is quantized to counts out of visit_scale. Boards and dense pi are rebuilt on demand, so a game
+    costs O(moves * top_k) instead of O(moves * board_size^2). It can be used wherever a GameRecord is.
+    """
+    def __init__(self, board_size, top_k=8, visit_scale=1000):
+        self._board_size = board_size
+        self._top_k = top_k
+        self._visit_scale = visit_scale
+        self._board = np.zeros(board_size * board_size, dtype=np.int8)  # board after the last ply
+        self._moves = []
+        self._colors = []
+        self._actions = []  # top_k actions of every ply
+        self._visits = []  # and their counts
+        self._has_target = []  # False for plies played without a policy target
+        self._result = None
+
+    def add(self, obs, color, pi, z=None):
+        """ same arguments as GameRecord.add, the move is the cell where obs differs from the previous board """
+        obs = np.asarray(obs).reshape(-1)
+        changed = np.flatnonzero(obs != self._board)
+        if len(changed) != 1:
+            raise ValueError('consecutive positions must differ by one stone, found ' + str(len(changed)))
+        action = changed[0]
+        self._board[action] = color
+        self._moves.append(action)
+        self._colors.append(color)
+        if pi is None:
+            self._has_target.append(False)
+            self._actions.append(np.zeros(self._top_k, dtype=np.int16))
+            self._visits.append(np.zeros(self._top_k, dtype=np.uint16))
+            return
+        pi = np.asarray(pi)
+        top = np.argsort(pi)[::-1][:self._top_k]
+        actions = np.zeros(self._top_k, dtype=np.int16)
+        visits = np.zeros(self._top_k, dtype=np.uint16)
+        actions[:len(top)] = top
+        visits[:len(top)] = np.rint(pi[top] * self._visit_scale)
+        self._has_target.append(True)
+        self._actions.append(actions)
+        self._visits.append(visits)
+
+    def set_z(self, result):
+        self._result = result
+        # the game is over, freeze the lists into arrays
+        self._moves = np.array(self._moves, dtype=np.int16)
+        self._colors = np.array(self._colors, dtype=np.int8)
+        self._actions = np.array(self._actions, dtype=np.int16).reshape(-1, self._top_k)
+        self._visits = np.array(self._visits, dtype=np.uint16).reshape(-1, self._top_k)
+        self._has_target = np.array(self._has_target, dtype=bool)
+
+    def num(self):
+        """ number of plies that carry a policy target """
+        return int(np.sum(self._has_target))
+
+    def plies(self):
+        """ number of plies played, with or without a policy target """
+        return len(self._moves)
+
+    def moves(self):
+        return np.asarray(self._moves), np.asarray(self._colors)
+
+    def target_plies(self):
+        """ the plies with a policy target, position i of get_all() is the board after ply target_plies()[i] """
+        return np.flatnonzero(np.asarray(self._has_target, dtype=bool))
+
+    def result(self):
+        return self._result
+
+    def board_size(self):
+        return self._board_size
+
+    def nbytes(self):
+        return sum(np.asarray(a).nbytes for a in [self._moves, self._colors, self._actions, self._visits,
+                                                  self._has_target]) + 1
+
+    def get_all(self):
+        """ obs, color, pi, z arrays of the plies with a policy target, in the order they were played """
+        moves, colors = self.moves()
+        n = len(moves)
+        placed = np.zeros((n, self._board_size * self._board_size), dtype=np.int8)
+        placed[np.arange(n), moves] = colors
+        boards = np.cumsum(placed, axis=0, dtype=np.int8)  # a cell is only ever filled once
+        keep = np.asarray(self._has_target, dtype=bool)
+        obs = boards[keep].reshape(-1, self._board_size, self._board_size)
+        pi = self._dense_pi(np.asarray(self._actions)[keep], np.asarray(self._visits)[keep])
+        return obs, colors[keep], pi, self._z(colors[keep])
+
+    def get_sample(self, percentage):
+        obs, color, pi, z = self.get_all()
+        indices = np.random.choice(len(color), int(len(color) * percentage), replace=False)
+        return obs[indices], color[indices], pi[indices], z[indices]
+
+    def _z(self, colors):
+        if self._result is None or self._result == 0:
+            return np.zeros(len(colors), dtype=np.int8)
+        return np.where(colors == self._result, 1, -1).astype(np.int8)
+
+    def _dense_pi(self, actions, visits):
+        pi = np.zeros((len(actions), self._board_size * self._board_size), dtype=np.float32)
+        rows = np.repeat(np.arange(len(actions)), actions.shape[1])
+        np.add.at(pi, (rows, actions.reshape(-1)), visits.reshape(-1))  # padding adds 0
+        total = pi.sum(axis=1, keepdims=True)
+        return pi / np.maximum(total, 1)
+
+
+def decode_batch(records, plies):
+    """ boards (B, size, size) and colors (B,) of position plies[b] of records[b], decoded for the whole batch at once.
+    Positions are numbered like num() and get_all(): only the plies with a policy target count. """
+    # pad the move lists of the distinct games once
+    games = []
+    slot = {}
+    game_of = np.empty(len(records), dtype=np.int64)
+    for b, record in enumerate(records):
+        if id(record) not in slot:
+            slot[id(record)] = len(games)
+            games.append(record)
+        game_of[b] = slot[id(record)]
+    plies = np.asarray(plies, dtype=np.int64)
+    nums = np.array([record.num() for record in games], dtype=np.int64)[game_of]
+    if np.any(plies < 0) or np.any(plies >= nums):
+        raise ValueError('positions must be in range(record.num())')
+    board_size = games[0].board_size()
+    length = max(len(record.moves()[0]) for record in games)
+    moves = np.zeros((len(games), length), dtype=np.int64)
+    colors = np.zeros((len(games), length), dtype=np.int8)
+    targets = np.zeros((len(games), length), dtype=np.int64)  # the ply of every position with a policy target
+    for g, record in enumerate(games):
+        m, c = record.moves()
+        moves[g, :len(m)] = m
+        colors[g, :len(c)] = c
+        target_plies = record.target_plies()
+        targets[g, :len(target_plies)] = target_plies
+    moves = moves[game_of]
+    colors = colors[game_of]
+    plies = targets[game_of, plies]
+    played = np.arange(length)[None, :] <= plies[:, None]
+    b, ply = np.nonzero(played)
+    boards = np.zeros((len(records), board_size * board_size), dtype=np.int8)
+    boards[b, moves[b, ply]] = colors[b, ply]
+    return boards.reshape(-1, board_size, board_size), colors[np.arange(len(records)), plies]
@@ -1,25 +1,32 @@
-import random
+from .sampling import to_batch
+import numpy as np
 
 
 class DataSet:
     def __init__(self):
         self._game_record = []
+        self._arrays = None  # all positions in contiguous arrays, built on the first sample
         
     def add_record(self, record):
         self._game_record.append(record)
+        self._arrays = None
         
     def get_sample(self, percentage):
-        obs = []
-        col = []
-        pi = []
-        z = []
-        for record in self._game_record:
-            a, b, c, d = record.get_sample(percentage)
-            obs.extend(a)
-            col.extend(b)
-            pi.extend(c)
-            z.extend(d)
-        return obs, col, pi, z
+        obs, col, pi, z = self._contiguous()
+        indices = np.random.choice(len(col), int(len(col) * percentage), replace=False)
+        return obs[indices], col[indices], pi[indices], z[indices]
+
+    def get_batch(self, percentage):
+        return to_batch(*self.get_sample(percentage))
+
+    def _contiguous(self):
+        if self._arrays is None:
+            records = [record.get_all() for record in self._game_record if record.num() > 0]
+            if not records:  # no position to sample yet: obs, color, pi, z are all empty
+                self._arrays = [np.zeros(0) for field in range(4)]
+            else:
+                self._arrays = [np.concatenate([np.asarray(part) for part in field]) for field in zip(*records)]
+        return self._arrays
 
     def record_num(self):
         return len(self._game_record)
@@ -32,8 +39,13 @@ class GameRecord:
         self._pi_list = []
         self._z_list = []
         self._total_num = 0
+        self._skipped_num = 0  # plies played without a policy target
 
     def add(self, obs, color, pi, z=None):
+        """ a ply whose pi is None (e.g. a fast search, see MCTS.action_steps) is counted but not stored """
+        if pi is None:
+            self._skipped_num += 1
+            return
         self._obs_list.append(obs)
         self._color_list.append(color)
         self._pi_list.append(pi)
@@ -50,12 +62,19 @@ class GameRecord:
             else:
                 self._z_list[i] = -1
 
+    def get_all(self):
+        return self._obs_list, self._color_list, self._pi_list, self._z_list
+
+    def num(self):
+        """ number of plies that carry a policy target """
+        return self._total_num
+
+    def plies(self):
+        """ number of plies played, with or without a policy target """
+        return self._total_num + self._skipped_num
+
     def get_sample(self, percentage):
         sample_num = int(self._total_num * percentage)
-        indices = random.sample([i for i in range(self._total_num)], sample_num)
-        obs_sample = [self._obs_list[index] for index in indices]
-        color_sample = [self._color_list[index] for index in indices]
-        pi_sample = [self._pi_list[index] for index in indices]
-        z_sample = [self._z_list[index] for index in indices]
-        return obs_sample, color_sample, pi_sample, z_sample
-
+        indices = np.random.choice(self._total_num, sample_num, replace=False)
+        return np.asarray(self._obs_list)[indices], np.asarray(self._color_list)[indices], \
+            np.asarray(self._pi_list)[indices], np.asarray(self._z_list)[indices]
@@ -0,0 +1,66 @@
+import numpy as np
+
+
+def transform(mats, k):
+    """ symmetry k (0-3: rotations, 4-7: reflection then rotation) applied to the last two axes """
+    if k >= 4:
+        mats = mats[..., ::-1]
+    return np.rot90(mats, k % 4, axes=(-2, -1))
+
+
+def symmetries(mats):
+    """ the 8 rotations/reflections of a batch of square matrices (N, size, size), stacked as (8, N, size, size) """
+    return np.stack([transform(mats, k) for k in range(8)])
+
+
+def cell_weights(size):
+    """ random hash weights of the cells, the same for every board of a size """
+    return np.random.RandomState(size).randint(1, 2 ** 62, size=size * size, dtype=np.int64).astype(np.uint64)
+
+
+def symmetry_cells(size):
+    """ per symmetry k: the cell of the original board at every cell of the copy k """
+    grid = np.arange(size * size).reshape(size, size)
+    return [transform(grid, k).reshape(-1) for k in range(8)]
+
+
+def canonical_hash(board, weights):
+    """ 64-bit hash of the canonical copy among the 8 symmetric copies of board, and the symmetry k giving it """
+    board = np.asarray(board, dtype=np.int8)
+    variants = np.stack([transform(board, k).reshape(-1) for k in range(8)])
+    hashes = ((variants + 1).astype(np.uint64) * weights).sum(axis=1)
+    k = int(np.argmin(hashes))
+    return int(hashes[k]), k
+
+
+def canonicalize(obs, pi):
+    """ map every position (and its pi) to one fixed representative of its 8 symmetric copies """
+    obs = np.asarray(obs, dtype=np.int8)
+    n, size = obs.shape[0], obs.shape[1]
+    variants = symmetries(obs)
+    # pick the variant with the smallest hash; it only has to be the same choice for identical positions
+    weights = cell_weights(size)
+    hashes = ((variants.reshape(8, n, -1) + 1).astype(np.uint64) * weights).sum(axis=2)
+    choice = np.argmin(hashes, axis=0)
+    rows = np.arange(n)
+    obs_c = variants[choice, rows]
+    pi_c = symmetries(np.asarray(pi).reshape(n, size, size))[choice, rows].reshape(n, -1)
+    return obs_c, pi_c
+
+
+def deduplicate(obs, color, pi, z):
+    """Merge the samples that are the same position up to symmetry.
+
+    return obs, color, pi (mean), z (mean), weight (number of merged samples) and stats
+    """
+    n = len(color)
+    obs_c, pi_c = canonicalize(obs, pi)
+    keys = np.concatenate([np.asarray(color, dtype=np.int8).reshape(-1, 1), obs_c.reshape(n, -1)], axis=1)
+    keys, first, inverse, count = np.unique(keys, axis=0, return_index=True, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    pi_sum = np.zeros((len(keys), pi_c.shape[1]), dtype=np.float64)
+    np.add.at(pi_sum, inverse, pi_c)
+    z_sum = np.bincount(inverse, weights=np.asarray(z, dtype=np.float64), minlength=len(keys))
+    stats = {'positions': n, 'unique': len(keys), 'ratio': 1 - len(keys) / float(max(n, 1))}
+    return obs_c[first], np.asarray(color)[first], (pi_sum / count[:, None]).astype(np.float32), \
+        (z_sum / count).astype(np.float32), count.astype(np.float32), stats
@@ -0,0 +1,89 @@
+import queue
+import threading
+import time
+from .dedup import transform
+import numpy as np
+
+
+def augment(tensor, pi):
+    """ apply an independent random symmetry to every sample of an encoded batch """
+    size = tensor.shape[-1]
+    pi = pi.reshape(-1, size, size)
+    kinds = np.random.randint(8, size=len(tensor))
+    tensor_t = np.empty_like(tensor)
+    pi_t = np.empty_like(pi)
+    for k in range(8):
+        rows = kinds == k
+        tensor_t[rows] = transform(tensor[rows], k)
+        pi_t[rows] = transform(pi[rows], k)
+    return tensor_t, pi_t.reshape(-1, size * size)
+
+
+class PrefetchLoader:
+    """Prepares training mini-batches in a background thread while the model trains on the previous ones.
+
+    The thread samples from a replay store (anything with sample_batch), augments the batch with random
+    symmetries and puts it into a queue of at most `depth` batches. NumPy releases the GIL for the heavy
+    parts, so preparing the data overlaps with training.
+    """
+    def __init__(self, source, batch_size, num_batches, depth=4, is_augmented=True):
+        self._source = source
+        self._batch_size = batch_size
+        self._num_batches = num_batches
+        self._is_augmented = is_augmented
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = False
+        self._thread = threading.Thread(target=self._produce)
+        self._thread.daemon = True
+        # statistics
+        self._start_time = None
+        self._end_time = None
+        self._stall_time = 0  # time the consumer waited for a batch
+        self._batches = 0
+
+    def start(self):
+        self._start_time = time.time()
+        self._thread.start()
+        return self
+
+    def _produce(self):
+        try:
+            for i in range(self._num_batches):
+                if self._stop:
+                    break
+                tensor, pi, z = self._source.sample_batch(self._batch_size)
+                if self._is_augmented:
+                    tensor, pi = augment(tensor, pi)
+                self._queue.put((tensor, pi, z))
+            self._queue.put(None)
+        except Exception as e:
+            self._queue.put(e)
+
+    def __iter__(self):
+        if self._start_time is None:
+            self.start()
+        while True:
+            start = time.time()
+            item = self._queue.get()
+            self._stall_time += time.time() - start
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            self._batches += 1
+            yield item
+        self._end_time = time.time()
+
+    def close(self):
+        self._stop = True
+        while self._thread.is_alive():  # unblock a producer waiting on a full queue
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._thread.join(0.01)
+
+    def stats(self):
+        elapsed = (self._end_time or time.time()) - self._start_time
+        return {'batches': self._batches, 'batches_per_second': self._batches / max(elapsed, 1e-9),
+                'stall_time': self._stall_time, 'stall_fraction': self._stall_time / max(elapsed, 1e-9)}
@@ -0,0 +1,124 @@
+from .sampling import *
+import numpy as np
+
+
+class ReplayBuffer:
+    """Fixed-capacity store of training positions shared across epochs.
+
+    All positions live in preallocated arrays used as a ring: appending is O(1) per position and, once the
+    buffer is full, overwrites the oldest one. Sampling draws from the newest `window` positions, either
+    uniformly, with weights halving every `half_life` positions of age ('recency'), or proportionally to
+    per-position priorities ('priority'). The trainer sets the priority of the samples it trained on to their
+    loss (see set_priority); a new position gets the largest priority seen so far. Weighted draws use a running
+    sum of the weights that is only rebuilt after the buffer changed.
+    """
+    def __init__(self, capacity, board_size, window=None, pi_dtype=np.float16, weighting='uniform', half_life=None):
+        self._capacity = capacity
+        self._board_size = board_size
+        self._window = capacity if window is None else min(window, capacity)
+        self._obs = np.zeros((capacity, board_size, board_size), dtype=np.int8)
+        self._color = np.zeros(capacity, dtype=np.int8)
+        self._pi = np.zeros((capacity, board_size * board_size), dtype=pi_dtype)
+        self._z = np.zeros(capacity, dtype=np.int8)
+        self._priority = np.ones(capacity, dtype=np.float32)
+        self._max_priority = 1.0  # priority of the positions added next
+        self._weighting = weighting
+        self._half_life = half_life
+        self._cumulative = None  # running sum of the sampling weights, newest position first
+        self._next = 0  # slot written next
+        self._num = 0  # number of valid slots
+
+    def add(self, obs, color, pi, z):
+        if z is None:
+            raise ValueError('the position has no game result z')
+        self._obs[self._next] = obs
+        self._color[self._next] = color
+        self._pi[self._next] = pi
+        self._z[self._next] = z
+        self._priority[self._next] = self._max_priority
+        self._cumulative = None
+        self._next = (self._next + 1) % self._capacity
+        self._num = min(self._num + 1, self._capacity)
+
+    def add_record(self, record):
+        obs, color, pi, z = record.get_all()
+        n = len(color)
+        if n == 0:
+            return
+        # the int8 z store has no value for an unknown result
+        if any(value is None for value in z) or (hasattr(record, 'result') and record.result() is None):
+            raise ValueError('the record has no game result, set_z() must be called when the game is over')
+        if n > self._capacity:  # only the last positions would survive anyway
+            keep = slice(-self._capacity, None)
+            obs, color, pi, z = obs[keep], color[keep], pi[keep], z[keep]
+            n = self._capacity
+        slots = (self._next + np.arange(n)) % self._capacity
+        self._obs[slots] = obs
+        self._color[slots] = color
+        self._pi[slots] = pi
+        self._z[slots] = z
+        self._priority[slots] = self._max_priority
+        self._cumulative = None
+        self._next = (self._next + n) % self._capacity
+        self._num = min(self._num + n, self._capacity)
+
+    def size(self):
+        """ number of positions that can be sampled """
+        return min(self._num, self._window)
+
+    def sample(self, num):
+        """ sample (with replacement) of num positions from the window: obs, color, pi, z arrays """
+        return self.get(self.sample_slots(num))
+
+    def sample_batch(self, num):
+        """ like sample, but already encoded for training: float32 tensor, pi, z """
+        return to_batch(*self.sample(num))
+
+    def sample_slots(self, num):
+        size = self.size()
+        if size == 0:
+            raise ValueError('cannot sample from an empty replay buffer')
+        if self._weighting == 'uniform':
+            age = np.random.randint(size, size=num)  # 0 is the newest position
+        else:
+            if self._cumulative is None:
+                if self._weighting == 'recency':
+                    weights = recency_weights(size, self._half_life)
+                else:
+                    weights = self._priority[(self._next - 1 - np.arange(size)) % self._capacity]
+                self._cumulative = np.cumsum(weights, dtype=np.float64)
+            age = weighted_sample(self._cumulative, num)
+        return (self._next - 1 - age) % self._capacity
+
+    def get(self, slots):
+        return self._obs[slots], self._color[slots], self._pi[slots].astype(np.float32), self._z[slots]
+
+    def set_priority(self, slots, priority):
+        self._priority[slots] = priority
+        self._max_priority = max(self._max_priority, float(np.max(priority)))
+        self._cumulative = None
+
+    def get_sample(self, percentage):
+        return self.sample(int(self.size() * percentage))
+
+    def set_window(self, window):
+        self._window = min(window, self._capacity)
+        self._cumulative = None
+
+    def capacity(self):
+        return self._capacity
+
+    def state(self):
+        """ copy of the contents, for a training checkpoint """
+        return {'obs': self._obs.copy(), 'color': self._color.copy(), 'pi': self._pi.copy(), 'z': self._z.copy(),
+                'priority': self._priority.copy(), 'next': self._next, 'num': self._num}
+
+    def load_state(self, state):
+        if state['obs'].shape != self._obs.shape:
+            raise ValueError('the checkpoint holds a replay buffer of another capacity or board size')
+        for field in ['obs', 'color', 'pi', 'z', 'priority']:
+            getattr(self, '_' + field)[...] = state[field]
+        self._next = state['next']
+        self._num = state['num']
+        self._max_priority = max(1.0, float(np.max(self._priority[:self._num], initial=1)))
+        self._cumulative = None
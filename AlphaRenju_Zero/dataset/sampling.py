@@ -0,0 +1,23 @@
+import numpy as np
+from ..network.encode import boards2tensor
+
+
+def recency_weights(size, half_life):
+    """ weight of the positions ordered from the newest (age 0) to the oldest """
+    return 0.5 ** (np.arange(size) / float(half_life))
+
+
+def weighted_sample(cumulative, num):
+    """ num indices drawn with replacement, proportionally to the weights whose running sum is cumulative """
+    return np.searchsorted(cumulative, np.random.uniform(0, cumulative[-1], num), side='right')
+
+
+def to_batch(obs, color, pi, z):
+    """ training-ready float32 arrays: input tensor (N, 3, size, size), pi (N, size*size), z (N,) """
+    return boards2tensor(obs, color), np.asarray(pi, dtype=np.float32), np.asarray(z, dtype=np.float32)
+
+
+def sample_loss(policy, value, pi, z):
+    """ training loss of every sample (policy cross-entropy + squared value error), e.g. as its replay priority """
+    cross_entropy = -np.sum(pi * np.log(np.asarray(policy) + 1e-10), axis=1)
+    return cross_entropy + (np.asarray(z) - np.asarray(value).reshape(-1)) ** 2
@@ -0,0 +1,232 @@
+import json
+import os
+import time
+from .sampling import *
+import numpy as np
+
+FORMAT_VERSION = 1
+FIELDS = ['obs', 'color', 'pi', 'z']
+
+
+class ShardStore:
+    """Append-only replay store on disk, made of fixed-size .npy shards and an index file.
+
+    directory/index.json           shard ids, number of valid rows, write times
+    directory/shard_<id>_<field>.npy   one preallocated array per field, opened with np.memmap
+
+    Self-play appends records to the newest shard, which is flushed before the index is updated, so after a
+    crash the index never points at rows that were not written. Training samples with a gather from the
+    read-only memory maps, so the store can be larger than RAM. Only one process may write a directory.
+    It offers the sampling interface of ReplayBuffer, with 'uniform' or 'recency' weighting.
+    """
+    def __init__(self, directory, board_size, shard_size=4096, window=None, max_shards=None, max_age=None,
+                 weighting='uniform', half_life=None):
+        self._directory = directory
+        self._board_size = board_size
+        self._shard_size = shard_size
+        self._window = window
+        self._max_shards = max_shards
+        self._max_age = max_age  # seconds since the last write of a shard
+        if weighting not in ['uniform', 'recency']:
+            raise ValueError('the replay store does not support weighting ' + str(weighting))
+        self._weighting = weighting
+        self._half_life = half_life
+        self._cumulative = None
+        self._shards = []  # dicts: id, num, updated
+        self._readers = {}  # shard id -> dict of read-only memmaps
+        self._writer = None  # shard being written: (info, dict of writable memmaps)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        if os.path.exists(self._index_file()):
+            self.refresh()
+            # whatever a previous run left half full is merged, new data goes into a new shard
+            self.compact()
+            self.apply_retention()
+        else:
+            self._write_index()
+
+    def refresh(self):
+        """ reread the index, e.g. when another process writes the store """
+        with open(self._index_file()) as f:
+            index = json.load(f)
+        if index['format_version'] > FORMAT_VERSION:
+            raise ValueError('unsupported replay index version: ' + str(index['format_version']))
+        if index['board_size'] != self._board_size:
+            raise ValueError('replay store holds {0}x{0} boards'.format(index['board_size']))
+        self._shard_size = index['shard_size']
+        self._shards = index['shards']
+        self._readers = {}
+        self._writer = None  # its shard info is not in the new list: the next append starts a new shard
+
+    def add(self, obs, color, pi, z):
+        if z is None:
+            raise ValueError('the position has no game result z')
+        self._append([obs], [color], [pi], [z])
+
+    def add_record(self, record):
+        obs, color, pi, z = record.get_all()
+        if len(color) == 0:
+            return
+        # the int8 z shard has no value for an unknown result
+        if any(value is None for value in z) or (hasattr(record, 'result') and record.result() is None):
+            raise ValueError('the record has no game result, set_z() must be called when the game is over')
+        self._append(obs, color, pi, z)
+
+    def _append(self, obs, color, pi, z, write_index=True):
+        data = {'obs': np.asarray(obs), 'color': np.asarray(color), 'pi': np.asarray(pi), 'z': np.asarray(z)}
+        n = len(data['color'])
+        done = 0
+        while done < n:
+            if self._writer is None or self._writer[0]['num'] == self._shard_size:
+                self._new_shard()
+            info, arrays = self._writer
+            step = min(n - done, self._shard_size - info['num'])
+            for field in FIELDS:
+                arrays[field][info['num']:info['num'] + step] = data[field][done:done + step]
+                arrays[field].flush()
+            info['num'] += step
+            info['updated'] = time.time()
+            done += step
+        if write_index:
+            self._write_index()
+
+    def _new_shard(self):
+        shard_id = max([info['id'] for info in self._shards] + [0]) + 1
+        info = {'id': shard_id, 'num': 0, 'updated': time.time()}
+        arrays = {}
+        for field, dtype, shape in self._layout():
+            arrays[field] = np.lib.format.open_memmap(self._shard_file(shard_id, field), mode='w+',
+                                                      dtype=dtype, shape=(self._shard_size,) + shape)
+        self._shards.append(info)
+        self._writer = (info, arrays)
+
+    def _layout(self):
+        size = self._board_size
+        return [('obs', np.int8, (size, size)), ('color', np.int8, ()),
+                ('pi', np.float16, (size * size,)), ('z', np.int8, ())]
+
+    def size(self):
+        total = sum(info['num'] for info in self._shards)
+        return total if self._window is None else min(total, self._window)
+
+    def sample(self, num):
+        """ uniform sample (with replacement) of num positions: obs, color, pi, z arrays """
+        if self.size() == 0:
+            raise ValueError('cannot sample from an empty replay store')
+        counts = np.array([info['num'] for info in self._shards])
+        ends = np.cumsum(counts)
+        if self._weighting == 'uniform':
+            age = np.random.randint(self.size(), size=num)  # 0 is the newest position
+        else:
+            if self._cumulative is None or len(self._cumulative) != self.size():
+                self._cumulative = np.cumsum(recency_weights(self.size(), self._half_life))
+            age = weighted_sample(self._cumulative, num)
+        rows = ends[-1] - 1 - age
+        shard_pos = np.searchsorted(ends, rows, side='right')
+        local = rows - (ends[shard_pos] - counts[shard_pos])
+        size = self._board_size
+        obs = np.empty((num, size, size), dtype=np.int8)
+        color = np.empty(num, dtype=np.int8)
+        pi = np.empty((num, size * size), dtype=np.float32)
+        z = np.empty(num, dtype=np.int8)
+        for pos in np.unique(shard_pos):
+            mask = shard_pos == pos
+            arrays = self._reader(self._shards[pos]['id'])
+            obs[mask] = arrays['obs'][local[mask]]
+            color[mask] = arrays['color'][local[mask]]
+            pi[mask] = arrays['pi'][local[mask]]
+            z[mask] = arrays['z'][local[mask]]
+        return obs, color, pi, z
+
+    def sample_batch(self, num):
+        """ like sample, but already encoded for training: float32 tensor, pi, z """
+        return to_batch(*self.sample(num))
+
+    def get_sample(self, percentage):
+        return self.sample(int(self.size() * percentage))
+
+    def _reader(self, shard_id):
+        if shard_id not in self._readers:
+            self._readers[shard_id] = {field: np.load(self._shard_file(shard_id, field), mmap_mode='r')
+                                       for field in FIELDS}
+        return self._readers[shard_id]
+
+    def compact(self):
+        """ merge the partially filled shards (except the one being written) into full ones """
+        current = None if self._writer is None else self._writer[0]['id']
+        partial = [info for info in self._shards if info['num'] < self._shard_size and info['id'] != current]
+        if len(partial) < 2:
+            self._remove([info for info in partial if info['num'] == 0])
+            return
+        data = {field: [] for field in FIELDS}
+        for info in partial:
+            arrays = self._reader(info['id'])
+            for field in FIELDS:
+                data[field].append(np.array(arrays[field][:info['num']]))
+        updated = max(info['updated'] for info in partial)
+        writer = self._writer
+        self._writer = None
+        first_new = len(self._shards)
+        # the merged shards are written first and the index then swaps them in, so a crash in between leaves
+        # either the old or the new shards indexed, never both or neither
+        self._append(*[np.concatenate(data[field]) for field in FIELDS], write_index=False)
+        # the merged shards keep the age and the place of the data they replace
+        merged = self._shards[first_new:]
+        for info in merged:
+            info['updated'] = updated
+        ids = [info['id'] for info in partial]
+        position = self._shards.index(partial[0])  # no partial shard comes before it
+        kept = [info for info in self._shards[:first_new] if info['id'] not in ids]
+        self._shards = kept[:position] + merged + kept[position:]
+        self._writer = writer
+        self._write_index()
+        self._delete_files(ids)
+
+    def apply_retention(self):
+        """ drop the oldest shards beyond max_shards, and the shards not written for max_age seconds """
+        current = None if self._writer is None else self._writer[0]['id']
+        expired = []
+        if self._max_age is not None:
+            now = time.time()
+            expired = [info for info in self._shards if now - info['updated'] > self._max_age and info['id'] != current]
+        if self._max_shards is not None:
+            remaining = [info for info in self._shards if info not in expired]
+            expired += [info for info in remaining[:max(0, len(remaining) - self._max_shards)] if info['id'] != current]
+        if expired:
+            self._remove(expired)
+
+    def state(self):
+        """ the store is on disk already: a checkpoint only records its size """
+        return {'directory': self._directory, 'size': self.size()}
+
+    def load_state(self, state):
+        # positions written after the checkpoint are kept
+        self.refresh()
+
+    def _remove(self, shards):
+        if not shards:
+            return
+        ids = [info['id'] for info in shards]
+        self._shards = [info for info in self._shards if info['id'] not in ids]
+        self._write_index()  # the index stops pointing at the files before they go away
+        self._delete_files(ids)
+
+    def _delete_files(self, ids):
+        for shard_id in ids:
+            self._readers.pop(shard_id, None)
+            for field in FIELDS:
+                os.remove(self._shard_file(shard_id, field))
+
+    def _write_index(self):
+        index = {'format_version': FORMAT_VERSION, 'board_size': self._board_size,
+                 'shard_size': self._shard_size, 'shards': self._shards}
+        tmp_file = self._index_file() + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_file, self._index_file())
+
+    def _index_file(self):
+        return os.path.join(self._directory, 'index.json')
+
+    def _shard_file(self, shard_id, field):
+        return os.path.join(self._directory, 'shard_{:06d}_{}.npy'.format(shard_id, field))
@@ -1,55 +1,150 @@
-from . import *
+from .rules import *
+from .agent.ai import MCTSAgent
+from .agent.mcts import evaluate_leaves
+from .network.slot import WeightSlot
+from .ui.board import Board
 from .dataset.dataset import *
+from .dataset.replay import ReplayBuffer
+from .dataset.shards import ShardStore
+from .dataset.compact import CompactRecord
+from .dataset.dedup import deduplicate
+from .dataset.sampling import to_batch, sample_loss
+from .dataset.loader import PrefetchLoader
+from .selfplay import SelfPlayPool
+from .lockstep import run_lockstep
+from .pipeline import Pipeline
+from .arena import Arena, match_score
+from .ladder import Ladder
+from .network.weightfile import load_weights
+from .checkpoint import CheckpointWriter, latest_state
+from .resign import Resignation
+from .opening import OpeningBook
+from .agent.cache import SearchCache, model_version
+import random
+import numpy as np
 
 
 class Env:
-    def __init__(self, conf):
+    def __init__(self, conf, network=None):
+        if conf['dedup'] and conf['prefetch_depth'] > 0:
+            raise ValueError('dedup merges the samples of one full batch, it does not apply to prefetched '
+                             'mini-batches: set prefetch_depth to 0 or dedup to False')
+        if conf['sample_weighting'] == 'priority' and (conf['dedup'] or conf['prefetch_depth'] > 0):
+            raise ValueError('priority weighting needs the loss of every sampled position, it works neither with '
+                             'dedup nor with prefetch_depth > 0')
+        if conf['resume'] and conf['checkpoint_dir'] is None:
+            raise ValueError('resume continues from the checkpoints of checkpoint_dir, which is not set')
         self._conf = conf
         self._is_self_play = conf['is_self_play']
 
         self._rules = Rules(conf)
-        self._renderer = Renderer(conf['screen_size'], conf['board_size'])
+        if conf['headless']:
+            self._renderer = None
+        else:
+            from .ui.renderer import Renderer  # pygame is only imported once a window is opened
+            self._renderer = Renderer(conf['screen_size'], conf['board_size'])
         self._board = Board(self._renderer, conf['board_size'])
 
-        self._agent_1 = MCTSAgent(conf, color=BLACK)
+        self._agent_1 = MCTSAgent(conf, color=BLACK, network=network)
         # self._agent_1 = HumanAgent(self._renderer, color=BLACK)
         # self._agent_2 = HumanAgent(self._renderer, color=WHITE)
-        self._agent_2 = MCTSAgent(conf, color=WHITE)
-        self._agent_eval = MCTSAgent(conf, color=WHITE)
-        self._agent_eval.set_self_play(False)
-
         if self._is_self_play:
             self._agent_2 = self._agent_1
+        else:
+            self._agent_2 = MCTSAgent(conf, color=WHITE)
+
+        # the best model is kept as an in-memory snapshot, and the evaluation agent switches it into
+        # the compiled model of agent_1 instead of building a second graph and reading the file
+        self._network = self._agent_1.network()
+        self._best_model = self._network.snapshot()
+        self._agent_eval = MCTSAgent(conf, color=WHITE, network=WeightSlot(self._network, self._best_model))
+        self._agent_eval.set_self_play(False)
 
         self._epoch = conf['epoch']
         self._sample_percentage = conf['sample_percentage']
         self._games_num = conf['games_num']
         self._evaluate_games_num = conf['evaluate_games_num']
+        if conf['replay_dir'] is None:
+            self._replay = ReplayBuffer(conf['replay_capacity'], conf['board_size'], conf['replay_window'],
+                                        weighting=conf['sample_weighting'], half_life=conf['recency_half_life'])
+        else:
+            self._replay = ShardStore(conf['replay_dir'], conf['board_size'], conf['shard_size'], conf['replay_window'],
+                                      conf['replay_max_shards'], conf['replay_max_age'],
+                                      conf['sample_weighting'], conf['recency_half_life'])
+        self._pool = None  # self-play worker processes, started by the first epoch when conf['workers'] > 0
+        self._arena = None  # evaluation processes, started by the first evaluation when conf['arena_workers'] > 0
+        self._best_flat_saved = False
+        self._ladder = None  # rating of the adopted models, when conf['ladder_dir'] is set
+        self._resignation = None
+        self._holdout_points = []  # of the holdout games not yet used for calibration
+        if conf['resign']:
+            self._resignation = Resignation(conf['resign_threshold'], conf['resign_moves'], conf['resign_holdout'],
+                                            conf['resign_false_positive'], conf['resign_threshold_max'])
+        self._book = None
+        if conf['opening_book'] is not None:
+            self._book = OpeningBook.load(conf['opening_book'], conf['board_size'], conf['opening_cache_file'])
+        self._search_cache = None
+        if conf['search_cache']:
+            self._search_cache = SearchCache(conf['board_size'], conf['search_cache_size'], conf['search_cache_plies'],
+                                             conf['search_cache_reuse'], conf['search_cache_file'])
+            self._agent_1.set_search_cache(self._search_cache)
+            self._update_search_cache()
+        self._checkpoints = None if conf['checkpoint_dir'] is None else CheckpointWriter(conf['checkpoint_dir'],
+                                                                                          conf['checkpoint_keep'])
 
     def run(self, record=None):
+        return evaluate_leaves(self._game(self._board, self._agent_1, self._agent_2, record, self._opening()))
+
+    def _opening(self, rng=np.random):
+        """ the book moves a game starts with, played without search; empty for a game from the empty board """
+        if self._book is None or rng.rand() >= self._conf['opening_rate']:
+            return []
+        if self._conf['opening_mode'] == 'moves':
+            return self._book.walk(rng)
+        return self._book.line(rng)
+
+    def _game(self, board, agent_1, agent_2, record=None, opening=()):
+        """ one game as a generator of leaf evaluations (see MCTS.action_steps), returns the winner """
+        for color, action in opening:
+            board.move(color, action)
+            if record is not None:
+                record.add(board.board(), color, None)
         result = None
-        while self._renderer.is_alive():
-            if self._is_self_play:
-                self._agent_1.color = self._board.current_player()
-            action, pi = self._current_agent().play(self._obs(), self._board.last_move(), self._board.stone_num())
-            result = self._check_rules(action)
+        # only self-play games resign, and a holdout share of them never does
+        resign = self._resignation is not None and agent_1 is agent_2
+        holdout = resign and self._resignation.is_holdout()
+        values = {BLACK: [], WHITE: []}
+        while self._renderer is None or self._renderer.is_alive():
+            if agent_1 is agent_2:  # self play
+                agent_1.color = board.current_player()
+            agent = agent_1 if board.current_player() == BLACK else agent_2
+            action, pi = yield from agent.play_steps(board.board(), board.last_move(), board.stone_num())
+            if resign:
+                values[board.current_player()].append(agent.root_value())
+                if not holdout and self._resignation.should_resign(values[board.current_player()]):
+                    result = 'whitewins' if board.current_player() == BLACK else 'blackwins'
+                    print(result + ' (resignation)')
+                    if record is not None:
+                        record.set_z(1 if result == 'blackwins' else -1)
+                    break
+            result = self._rules.check_rules(board.board(), action, board.current_player())
             if result == 'continue':
-                color = self._board.current_player()
+                color = board.current_player()
                 # print(result + ': ', action, color)
-                self._board.move(color, action)
-                if record is not None and pi is not None:
-                    obs = self._board.board()
+                board.move(color, action)
+                if record is not None:
+                    obs = board.board()
                     record.add(obs, color, pi)
             if result == 'occupied':
                 print(result + ': ' + str(action))
                 continue
             if result == 'blackwins' or result == 'whitewins' or result == 'draw':
-                self._board.move(self._board.current_player(), action)
+                board.move(board.current_player(), action)
                 print(result)
-                color = self._board.current_player()
-                self._board.move(color, action)
-                if record is not None and pi is not None:
-                    obs = self._board.board()
+                color = board.current_player()
+                board.move(color, action)
+                if record is not None:
+                    obs = board.board()
                     record.add(obs, color, pi)
                     if result == 'blackwins':
                         flag = 1
@@ -60,47 +155,252 @@ class Env:
                     record.set_z(flag)
                 # time.sleep(30)
                 break
-        self._board.clear()
-        self._agent_1.reset_mcts()
-        self._agent_2.reset_mcts()
+        board.clear()
+        agent_1.reset_mcts()
+        agent_2.reset_mcts()
         print('*****************************************************')
+        winner = 0
         if result == 'blackwins':
-            return BLACK
+            winner = BLACK
         if result == 'whitewins':
-            return WHITE
-        return 0
+            winner = WHITE
+        if holdout:
+            # calibrated by the process that runs the self-play loop, see calibrate_resignation
+            self._holdout_points.append(self._resignation.holdout_point(values, winner))
+        return winner
+
+    def take_holdout_points(self):
+        """ the resign points of the holdout games finished since the last call """
+        points, self._holdout_points = self._holdout_points, []
+        return points
+
+    def calibrate_resignation(self, points):
+        if self._resignation is not None and points:
+            self._resignation.add_points(points)
+            print(self._resignation.report())
+
+    def set_resign_threshold(self, threshold):
+        if self._resignation is not None:
+            self._resignation.set_threshold(threshold)
 
     def train(self):
-        for epoch in range(self._epoch):
-            data_set = DataSet()
+        if self._conf['pipeline'] and (self._conf['resume'] or self._conf['checkpoint_dir'] is not None):
+            raise ValueError('the pipeline neither writes checkpoints nor resumes from them')
+        try:
+            if self._conf['pipeline']:
+                Pipeline(self._conf, self._agent_1, self._replay, self.learn, self._resignation).run()
+            else:
+                self._train()
+        finally:
+            self.close()
+
+    def _train(self):
+        start = self.resume() if self._conf['resume'] else 0
+        for epoch in range(start, self._epoch):
             print('epoch = ' + str(epoch))
-            for i in range(self._games_num):
-                record = GameRecord()
-                print('game_num = ' + str(i))
-                self.run(record)
-                data_set.add_record(record)
-            obs, col, pi, z = data_set.get_sample(self._sample_percentage)
-            self._agent_1.train(obs, col, pi, z)
+            new_positions = 0
+            for record in self.self_play():
+                self._replay.add_record(record)
+                new_positions += record.num()
+            if self._search_cache is not None:
+                # saved before learn() moves on to the next model version, which drops the entries
+                self._search_cache.save()
+            stats = self._pool.search_cache_stats() if self._pool is not None else self.search_cache_stats()
+            if stats is not None:
+                print('search cache: {entries} entries, hit rate {hit_rate:.1%} of {lookups} lookups, '
+                      '{simulations_saved} simulations saved'.format(**stats))
+            self.learn(new_positions)
 
             # ready to evaluate
             if self.evaluate():
-                self._agent_1.save_model()
+                self._adopt_model()
+            if self._checkpoints is not None and (epoch + 1) % self._conf['checkpoint_every'] == 0:
+                self._checkpoints.save(epoch + 1, self.state(epoch + 1))
             print('*****************************************************')
 
+    def state(self, epoch):
+        """ copy of everything needed to continue training after epoch finished epochs """
+        # not included: the ladder lives in conf['ladder_dir'] already, and the arena rewrites the best flat file
+        # after a resume (_best_flat_saved starts False again)
+        return {'epoch': epoch, 'weights': self._network.snapshot(), 'best_model': self._best_model,
+                'optimizer': self._network.optimizer_state(), 'replay': self._replay.state(),
+                'resignation': None if self._resignation is None else self._resignation.state(),
+                'random': random.getstate(), 'numpy_random': np.random.get_state()}
+
+    def resume(self):
+        """ load the newest checkpoint of conf['checkpoint_dir'], return the number of finished epochs """
+        state = latest_state(self._conf['checkpoint_dir'])
+        if state is None:
+            print('no checkpoint to resume from')
+            return 0
+        self._network.restore(state['weights'])
+        self._network.set_optimizer_state(state['optimizer'])
+        self._best_model = state['best_model']
+        self._agent_eval.network().set_snapshot(self._best_model)
+        self._replay.load_state(state['replay'])
+        if self._resignation is not None and state.get('resignation') is not None:
+            self._resignation.load_state(state['resignation'])
+        random.setstate(state['random'])
+        np.random.set_state(state['numpy_random'])
+        self._update_search_cache()
+        print('resumed after epoch ' + str(state['epoch']))
+        return state['epoch']
+
+    def learn(self, new_positions):
+        """ one training step on the replay store, after new_positions positions were added to it """
+        # as many samples as before, but drawn from the whole replay window
+        sample_num = int(new_positions * self._sample_percentage)
+        if self._conf['prefetch_depth'] > 0:
+            self._train_prefetched(sample_num)
+        elif self._conf['dedup']:
+            self._train_deduplicated(sample_num)
+        elif self._conf['sample_weighting'] == 'priority':
+            self._train_prioritized(sample_num)
+        else:
+            self._agent_1.train_batch(*self._replay.sample_batch(sample_num))
+        self._update_search_cache()
+        if isinstance(self._replay, ShardStore):
+            self._replay.apply_retention()
+
+    def self_play(self):
+        """ the finished records of one epoch, played here or streamed from the worker processes """
+        lockstep = self._conf['lockstep_games']
+        if self._conf['workers'] == 0 and lockstep > 1:
+            for start in range(0, self._games_num, lockstep):
+                records = [self._new_record() for i in range(min(lockstep, self._games_num - start))]
+                agents = [MCTSAgent(self._conf, BLACK, network=self._network) for record in records]
+                for agent in agents:
+                    agent.set_search_cache(self._search_cache)
+                self._run_lockstep([(agent, agent) for agent in agents], records)
+                self.calibrate_resignation(self.take_holdout_points())
+                for record in records:
+                    yield record
+            return
+        if self._conf['workers'] == 0:
+            for i in range(self._games_num):
+                print('game_num = ' + str(i))
+                record = self.self_play_game()
+                self.calibrate_resignation(self.take_holdout_points())
+                yield record
+            return
+        # the workers play with the weights being trained, like agent_1 does in this process
+        self._network.save_flat(self._conf['selfplay_flat_file'])
+        if self._pool is None:
+            self._pool = SelfPlayPool(self._conf, self._conf['workers'], self._conf['seed'], self._resignation).start()
+        else:
+            self._pool.publish()
+        for i, record in enumerate(self._pool.play(self._games_num)):
+            print('game_num = ' + str(i))
+            yield record
+
+    def _run_lockstep(self, pairings, records=None, openings=None):
+        """ play the games (black agent, white agent) of pairings together, return their winners.
+        openings: the book moves of every game, drawn per game by default """
+        records = records or [None] * len(pairings)
+        openings = openings or [self._opening() for pairing in pairings]
+        games = [self._game(Board(None, self._conf['board_size']), black, white, record, opening)
+                 for (black, white), record, opening in zip(pairings, records, openings)]
+        winners, stats = run_lockstep(games)
+        print('lockstep: {games} games, {leaves} leaves in {batches} batches ({leaves_per_batch:.1f} per batch), '
+              '{seconds:.1f} s'.format(**stats))
+        return winners
+
+    def self_play_game(self):
+        record = self._new_record()
+        self.run(record)
+        return record
+
+    def evaluate_flat(self, candidate_file, best_file):
+        """ evaluate() between two flat weight files, in an evaluator process with the NumPy backend """
+        self.load_arena(candidate_file, best_file)
+        return self.evaluate()
+
+    def reload_network(self):
+        """ read conf['net_flat_file'] again into the NumPy network of this Env (self-play workers) """
+        self._network.load_flat(self._conf['net_flat_file'])
+        self._update_search_cache()
+
+    def search_cache_stats(self):
+        return None if self._search_cache is None else self._search_cache.stats()
+
+    def _update_search_cache(self):
+        # cached roots are only used with the weights that searched them
+        if self._search_cache is not None:
+            weights = self._network.snapshot()
+            if weights is None:  # a RemoteNetwork: the server plays with the weights of the flat file
+                weights = load_weights(self._conf['net_flat_file'])[0]
+            self._search_cache.set_version(model_version(weights))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        if self._arena is not None:
+            self._arena.close()
+            self._arena = None
+        if self._checkpoints is not None:
+            self._checkpoints.close()
+        if self._search_cache is not None:
+            self._search_cache.save()
+
+    def _train_prefetched(self, sample_num):
+        batch_size = self._conf['batch_size']
+        num_batches = self._conf['train_epochs'] * max(1, -(-sample_num // batch_size))
+        loader = PrefetchLoader(self._replay, batch_size, num_batches, self._conf['prefetch_depth'])
+        try:
+            self._agent_1.train_loader(loader)
+        finally:
+            loader.close()
+
+    def _train_prioritized(self, sample_num):
+        slots = self._replay.sample_slots(sample_num)
+        tensor, pi, z = to_batch(*self._replay.get(slots))
+        self._agent_1.train_batch(tensor, pi, z)
+        # the samples are drawn again in proportion to their loss under the trained weights
+        policy, value = self._network.predict_on_batch(tensor)
+        loss = sample_loss(policy, value, pi, z)
+        self._replay.set_priority(slots, loss)
+        print('priority: mean loss {:.3f}, max {:.3f} over {} samples'.format(np.mean(loss), np.max(loss), len(loss)))
+
+    def _train_deduplicated(self, sample_num):
+        obs, col, pi, z, weight, stats = deduplicate(*self._replay.sample(sample_num))
+        tensor, pi, z = to_batch(obs, col, pi, z)
+        train_time = self._agent_1.train_batch(tensor, pi, z, weight)
+        print('dedup: {} -> {} samples (ratio {:.3f}), trained in {:.2f} s'.format(
+            stats['positions'], stats['unique'], stats['ratio'], train_time))
+
     def evaluate(self):
         print('Evaluation begins:')
+        if self._conf['arena_workers'] > 0:
+            return self._evaluate_arena()
+        if self._conf['lockstep_games'] > 1:
+            rate = self._evaluate_lockstep()
+        else:
+            rate = self._evaluate_sequential()
+        print('winning rate = ' + str(rate))
+        if rate > 0.55:
+            print('adopt new model')
+            return True
+        else:
+            print('discard new model')
+            return False
+
+    def _evaluate_sequential(self):
 
         # switch mode
         self._is_self_play = False
         self._agent_1.set_self_play(False)
+        candidate = self._agent_1.snapshot_model()
+        self._agent_1.set_network(WeightSlot(self._network, candidate))
         self._agent_2 = self._agent_eval
-        self._agent_2.load_model()
 
-        new_model_wins_num = 0
+        new_model_wins_num, draws = 0, 0
         total_num = self._evaluate_games_num
 
         for i in range(int(total_num/2)):
-            new_model_wins_num += max(self.run(), 0)   # new model plays BLACK
+            winner = self.run()   # new model plays BLACK
+            new_model_wins_num += winner == BLACK
+            draws += winner == 0
             print('number of new model wins: ' + str(new_model_wins_num) + '/' + str(i+1))
 
         # switch agents
@@ -109,7 +409,9 @@ class Env:
         self._agent_2.color = WHITE
 
         for i in range(int(total_num/2)):
-            new_model_wins_num -= min(self.run(), 0)
+            winner = self.run()
+            new_model_wins_num += winner == WHITE
+            draws += winner == 0
             print('number of new model wins: ' + str(new_model_wins_num) + '/' + str(i+1+int(total_num/2)))
 
         # so far self._agent_1 -> self._agent_eval
@@ -119,23 +421,90 @@ class Env:
         self._agent_1.set_self_play(True)
         self._is_self_play = True
 
-        rate = new_model_wins_num / total_num
-        print('winning rate = ' + str(rate))
-        if rate > 0.55:
-            print('adopt new model')
-            return True
-        else:
-            print('discard new model')
-            return False
+        # give the candidate weights back to the model that is trained
+        self._network.restore(candidate)
+        self._agent_1.set_network(self._network)
 
-    def _obs(self):
-        return self._board.board()
+        return match_score(new_model_wins_num, draws) / total_num
 
-    def _current_agent(self):
-        if self._board.current_player() == BLACK:
-            return self._agent_1
-        else:
-            return self._agent_2
+    def _evaluate_lockstep(self):
+        # one slot per side for all games, so that the leaves of a side are evaluated in one batch
+        candidate = self._agent_1.snapshot_model()
+        new_model = WeightSlot(self._network, candidate)
+        best_model = self._agent_eval.network()
+        half = int(self._evaluate_games_num / 2)
+        pairings = [(self._arena_agent(new_model), self._arena_agent(best_model)) for i in range(half)] + \
+                   [(self._arena_agent(best_model), self._arena_agent(new_model)) for i in range(half)]
+        # game i and game half + i swap the colours of the same book line, like the pairs of Arena
+        seeds = np.random.randint(2 ** 31, size=half)
+        openings = [self._opening(np.random.RandomState(seed)) for seed in seeds] * 2
+        lockstep = self._conf['lockstep_games']
+        winners = []
+        for start in range(0, len(pairings), lockstep):
+            winners += self._run_lockstep(pairings[start:start + lockstep], openings=openings[start:start + lockstep])
+        new_model_wins_num = sum(w == BLACK for w in winners[:half]) + sum(w == WHITE for w in winners[half:])
+        draws = winners.count(0)
+        print('number of new model wins: {}/{} ({} draws)'.format(new_model_wins_num, 2 * half, draws))
+
+        # give the candidate weights back to the model that is trained
+        self._network.restore(candidate)
+        return match_score(new_model_wins_num, draws) / self._evaluate_games_num
+
+    def _evaluate_arena(self):
+        conf = self._conf
+        candidate = self._agent_1.snapshot_model()
+        self._network.save_flat(conf['candidate_flat_file'])
+        if not self._best_flat_saved:
+            # until the first adoption the best model only exists in memory
+            self._network.restore(self._best_model)
+            self._network.save_flat(conf['net_flat_file'])
+            self._network.restore(candidate)
+            self._best_flat_saved = True
+        result = self._start_arena().play(conf['candidate_flat_file'], conf['net_flat_file'], self._evaluate_games_num)
+        print('number of new model wins: {}/{} ({} draws), decided by {}, {} of {} games saved'.format(
+            result['wins'], result['games'], result['draws'], result['reason'], result['games_saved'],
+            self._evaluate_games_num))
+        print('adopt new model' if result['adopted'] else 'discard new model')
+        return result['adopted']
+
+    def _start_arena(self):
+        if self._arena is None:
+            self._arena = Arena(self._conf, max(1, self._conf['arena_workers']), self._conf['seed']).start()
+        return self._arena
+
+    def load_arena(self, candidate_file, best_file):
+        """ read both sides of the arena games from flat weight files (NumPy backend) """
+        best, meta = load_weights(best_file)
+        self._agent_eval.network().set_snapshot(best)
+        self._network.load_flat(candidate_file)
+        self._arena_candidate = self._network.snapshot()
+
+    def arena_game(self, new_model_black, opening_seed=None):
+        """one game of the candidate of load_arena against the best model: 1 won, 0 draw, -1 lost.
+        Games with the same opening_seed start with the same book moves."""
+        new_model = self._arena_agent(WeightSlot(self._network, self._arena_candidate))
+        best_model = self._arena_agent(self._agent_eval.network())
+        board = Board(None, self._conf['board_size'])
+        opening = self._opening(np.random if opening_seed is None else np.random.RandomState(opening_seed))
+        if new_model_black:
+            return evaluate_leaves(self._game(board, new_model, best_model, opening=opening))
+        return -evaluate_leaves(self._game(board, best_model, new_model, opening=opening))
+
+    def _arena_agent(self, network):
+        agent = MCTSAgent(self._conf, BLACK, network=network)
+        agent.set_self_play(False)
+        return agent
+
+    def _new_record(self):
+        if self._conf['compact_records']:
+            return CompactRecord(self._conf['board_size'], self._conf['record_top_k'])
+        return GameRecord()
 
-    def _check_rules(self, action):
-        return self._rules.check_rules(self._board.board(), action, self._board.current_player())
+    def _adopt_model(self):
+        self._best_model = self._agent_1.snapshot_model()
+        self._agent_eval.network().set_snapshot(self._best_model)
+        self._agent_1.save_model()
+        if self._conf['ladder_dir'] is not None:
+            if self._ladder is None:
+                self._ladder = Ladder(self._conf, self._start_arena())
+            self._ladder.add(self._network)
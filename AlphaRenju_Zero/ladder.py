@@ -0,0 +1,185 @@
+"""
+Elo ladder of the adopted models.
+
+directory/registry.json      one entry per checkpoint: id, flat weight file, time of adoption
+directory/matches.json       results of every match played between two checkpoints
+directory/ckpt_<id>.arzw     the weights of the checkpoints
+
+Match results are cached under the pair of checkpoints and the search settings they were played with, so the
+games of a pairing are never lost: when a pair is scheduled again, its new games are added to the cached ones.
+The ratings are a BayesElo-style fit: the maximum a posteriori Bradley-Terry model under a Gaussian prior, with
+draws counted as half a win. New matches go to the pairs whose outcome is least predictable from the ratings,
+discounted by the games already cached for the pair.
+"""
+import hashlib
+import json
+import os
+import time
+from math import log
+import numpy as np
+
+ELO_SCALE = 400 / log(10)  # natural units of the Bradley-Terry model -> Elo
+SEARCH_SETTINGS = ['board_size', 'forbidden_moves', 'c_puct', 'simulation_times', 'initial_tau', 'careful_stage',
+                   'root_policy', 'gumbel_k', 'gumbel_c_visit', 'gumbel_c_scale']
+
+
+def _write_json(path, value):
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(value, f, indent=1)
+    os.replace(tmp_file, path)
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+class CheckpointRegistry:
+    """ every adopted model, as a flat weight file """
+    def __init__(self, directory):
+        self._directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._checkpoints = _read_json(self._registry_file(), [])
+
+    def add(self, network):
+        """ store the current weights of network (a Network) as a new checkpoint, return its id """
+        checkpoint_id = max([c['id'] for c in self._checkpoints] + [0]) + 1
+        file_name = 'ckpt_{:04d}.arzw'.format(checkpoint_id)
+        network.save_flat(os.path.join(self._directory, file_name))
+        self._checkpoints.append({'id': checkpoint_id, 'file': file_name, 'time': time.time()})
+        _write_json(self._registry_file(), self._checkpoints)
+        return checkpoint_id
+
+    def ids(self):
+        return [c['id'] for c in self._checkpoints]
+
+    def file(self, checkpoint_id):
+        for c in self._checkpoints:
+            if c['id'] == checkpoint_id:
+                return os.path.join(self._directory, c['file'])
+        raise KeyError('no checkpoint ' + str(checkpoint_id))
+
+    def _registry_file(self):
+        return os.path.join(self._directory, 'registry.json')
+
+
+class MatchCache:
+    """ persistent results of the matches between two checkpoints, keyed by the pair and the search settings """
+    def __init__(self, path, conf):
+        self._path = path
+        self._settings = settings_key(conf)
+        self._results = _read_json(path, {})
+
+    def _key(self, a, b):
+        return '{}-{}|{}'.format(a, b, self._settings)
+
+    def add(self, a, b, wins_a, wins_b, draws):
+        if a > b:
+            a, b, wins_a, wins_b = b, a, wins_b, wins_a
+        key = self._key(a, b)
+        old = self._results.get(key, [0, 0, 0])
+        self._results[key] = [old[0] + wins_a, old[1] + wins_b, old[2] + draws]
+        _write_json(self._path, self._results)
+
+    def get(self, a, b):
+        """ wins of a, wins of b and draws of all the games cached for the pair """
+        if a > b:
+            wins_b, wins_a, draws = self.get(b, a)
+            return wins_a, wins_b, draws
+        return tuple(self._results.get(self._key(a, b), [0, 0, 0]))
+
+    def games(self, a, b):
+        return sum(self.get(a, b))
+
+
+def settings_key(conf):
+    """ short hash of the settings that change the outcome of a game between two fixed models """
+    text = json.dumps([conf[key] for key in SEARCH_SETTINGS])
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def fit_elo(ids, cache, prior_sigma=400, iterations=50):
+    """ MAP ratings and their standard errors (Elo, the first id at 0) of the checkpoints ids """
+    n = len(ids)
+    pairs = []
+    for i in range(n):
+        for j in range(i + 1, n):
+            wins_i, wins_j, draws = cache.get(ids[i], ids[j])
+            games = wins_i + wins_j + draws
+            if games > 0:
+                pairs.append((i, j, games, wins_i + draws / 2))
+    beta = np.zeros(n)
+    precision = (ELO_SCALE / prior_sigma) ** 2
+    hessian = -precision * np.eye(n)
+    for it in range(iterations):
+        gradient = -precision * beta
+        hessian = -precision * np.eye(n)
+        for i, j, games, score in pairs:
+            p = 1 / (1 + np.exp(beta[j] - beta[i]))
+            gradient[i] += score - games * p
+            gradient[j] -= score - games * p
+            information = games * p * (1 - p)
+            hessian[i, i] -= information
+            hessian[j, j] -= information
+            hessian[i, j] += information
+            hessian[j, i] += information
+        step = np.linalg.solve(hessian, gradient)
+        beta -= step
+        if np.max(np.abs(step)) < 1e-6:
+            break
+    covariance = np.linalg.inv(-hessian)
+    # the ratings are relative to the first checkpoint
+    ratings = ELO_SCALE * (beta - beta[0])
+    variance = np.diag(covariance) + covariance[0, 0] - 2 * covariance[:, 0]
+    sigma = ELO_SCALE * np.sqrt(np.maximum(variance, 0))
+    return ratings, sigma
+
+
+def schedule(ids, ratings, sigma, cache, matches):
+    """ the pairs to play next: large uncertainty of the difference, outcome close to even, few cached games """
+    scores = []
+    for i in range(len(ids)):
+        for j in range(i + 1, len(ids)):
+            p = 1 / (1 + 10 ** ((ratings[j] - ratings[i]) / 400))
+            score = (sigma[i] ** 2 + sigma[j] ** 2) * p * (1 - p) / (1 + cache.games(ids[i], ids[j]))
+            scores.append((score, ids[i], ids[j]))
+    scores.sort(reverse=True)
+    return [(a, b) for score, a, b in scores[:matches]]
+
+
+class Ladder:
+    """ registry, match cache and rating of the adopted models; matches are played by an Arena """
+    def __init__(self, conf, arena):
+        self._conf = conf
+        self._arena = arena
+        self._registry = CheckpointRegistry(conf['ladder_dir'])
+        self._cache = MatchCache(os.path.join(conf['ladder_dir'], 'matches.json'), conf)
+
+    def add(self, network):
+        """ register the adopted model of network, play the scheduled matches and print the ladder """
+        self._registry.add(network)
+        ids = self._registry.ids()
+        if len(ids) < 2:
+            return
+        ratings, sigma = fit_elo(ids, self._cache)
+        for a, b in schedule(ids, ratings, sigma, self._cache, self._conf['ladder_matches']):
+            wins_a, wins_b, draws = self._arena.match(self._registry.file(a), self._registry.file(b),
+                                                      self._conf['ladder_games'])
+            self._cache.add(a, b, wins_a, wins_b, draws)
+            print('ladder match {} - {}: {} - {} ({} draws)'.format(a, b, wins_a, wins_b, draws))
+        self.report()
+
+    def ratings(self):
+        """ {checkpoint id: (elo, standard error)} """
+        ids = self._registry.ids()
+        ratings, sigma = fit_elo(ids, self._cache)
+        return {c: (float(r), float(s)) for c, r, s in zip(ids, ratings, sigma)}
+
+    def report(self):
+        print('ladder:')
+        for checkpoint_id, (rating, sigma) in self.ratings().items():
+            print('  checkpoint {:4d}: {:7.1f} +- {:5.1f} Elo'.format(checkpoint_id, rating, sigma))
@@ -0,0 +1,41 @@
+from collections import OrderedDict
+import time
+
+
+def run_lockstep(games):
+    """Advance several games together in one process.
+
+    Every game is a generator of leaf evaluations as made by Env._game or MCTS.action_steps: it yields
+    (network, board, color) and expects (indices, priors, value) back. Each round collects the pending leaf of
+    every game and evaluates the leaves of one network with a single predict_legal_batch call, so K games cost
+    one forward pass of K positions instead of K passes of one. Returns the results of the games, in order,
+    and a dict of statistics.
+    """
+    start = time.time()
+    results = [None] * len(games)
+    pending = OrderedDict()  # game index -> (network, board, color)
+    stats = {'games': len(games), 'leaves': 0, 'batches': 0}
+
+    def advance(i, output=None):
+        try:
+            pending[i] = games[i].send(output)  # send(None) starts a generator
+        except StopIteration as stop:
+            pending.pop(i, None)
+            results[i] = stop.value
+
+    for i in range(len(games)):
+        advance(i)
+    while pending:
+        # the leaves of different networks (e.g. the two sides of an arena) go into separate batches
+        groups = OrderedDict()
+        for i, (network, board, color) in pending.items():
+            groups.setdefault(id(network), (network, []))[1].append(i)
+        for network, indices in groups.values():
+            outputs = network.predict_legal_batch([pending[i][1] for i in indices], [pending[i][2] for i in indices])
+            stats['leaves'] += len(indices)
+            stats['batches'] += 1
+            for i, output in zip(indices, outputs):
+                advance(i, output)
+    stats['seconds'] = time.time() - start
+    stats['leaves_per_batch'] = stats['leaves'] / max(stats['batches'], 1)
+    return results, stats
@@ -1 +1,25 @@
-from .network import *
+from .._lazy import lazy_exports
+import os
+
+# only the Keras network imports Keras; the NumPy backend and the weight file do not
+_exports = {'Network': '.network', 'NumpyNetwork': '.numpynet', 'QuantizedNetwork': '.quantize', 'WeightSlot': '.slot',
+            'InferenceServer': '.server', 'RemoteNetwork': '.server',
+            'board2tensor': '.encode', 'boards2tensor': '.encode'}
+__all__ = list(_exports) + ['make_network']
+__getattr__ = lazy_exports(globals(), _exports)
+
+
+def make_network(conf):
+    """ the trainable Keras network, or the inference-only NumPy copy read from net_flat_file """
+    if conf['backend'] == 'numpy':
+        if not os.path.exists(conf['net_flat_file']):
+            raise FileNotFoundError('no flat weight file {}; the numpy backend cannot read {} without Keras, convert it '
+                                    'once with "python run.py --convert-weights"'.format(conf['net_flat_file'],
+                                                                                         conf['net_para_file']))
+        if conf['inference'] != 'float32':
+            from .quantize import QuantizedNetwork
+            return QuantizedNetwork.load(conf['net_flat_file'], conf['inference'], conf['quant_scale_file'])
+        from .numpynet import NumpyNetwork
+        return NumpyNetwork.load(conf['net_flat_file'])
+    from .network import Network
+    return Network(conf)
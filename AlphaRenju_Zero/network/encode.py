@@ -0,0 +1,60 @@
+import numpy as np
+
+
+def board2tensor(board, color, reshape_flag = True):
+    """Current-Stone Layer"""
+    cur = np.array(np.array(board) == color, dtype = int)
+    """Enemy-Stone Layer"""
+    e = np.array(np.array(board) == -color, dtype = int)
+    """Color Layer"""
+    c = color * np.ones((board.shape[0], board.shape[1]))
+    """Stack cur,e,c into tensor"""
+    tensor = np.array([cur, e, c])
+    if reshape_flag:
+        tensor = tensor.reshape(1, tensor.shape[0], tensor.shape[1], tensor.shape[2])
+    return tensor   
+
+
+def boards2tensor(boards, colors):
+    """ batch version of board2tensor: boards (N, size, size), colors (N,) -> float32 (N, 3, size, size) """
+    boards = np.asarray(boards)
+    colors = np.asarray(colors).reshape(-1, 1, 1)
+    tensor = np.empty((boards.shape[0], 3, boards.shape[1], boards.shape[2]), dtype=np.float32)
+    tensor[:, 0] = boards == colors
+    tensor[:, 1] = boards == -colors
+    tensor[:, 2] = colors
+    return tensor
+
+
+def legal_policy(policy, board):
+    """ renormalize a full policy over the empty cells of board, returned in compact form (indices, priors) """
+    legal = np.flatnonzero(np.asarray(board).reshape(-1) == 0)
+    priors = np.asarray(policy).reshape(-1)[legal]
+    total = priors.sum()
+    if total > 0:
+        priors = priors / total
+    else:
+        priors = np.ones(len(legal)) / len(legal)
+    return legal, priors
+
+
+def _symmetry(mat, num):
+    """ num < 4: rotation by num * 90 degrees; num >= 4: the same rotation after a left-right flip """
+    if num >= 4:
+        mat = np.fliplr(mat)
+    return np.rot90(mat, num % 4)
+
+
+# input:matrix;output:matrix
+def input_transform(mat):
+    num = int(np.random.randint(8)) # generate a random number within range(8)
+    return _symmetry(mat, num), num
+
+
+# input:vector; output:vector
+def output_decode(vec, num, size):
+    inv_num = [0, 3, 2, 1, 4, 5, 6, 7][num] # the flipped ones are their own inverse
+    mat = np.reshape(vec, (size,size)) #reshape vector into matrix
+    inv_mat = _symmetry(mat, inv_num)
+    vec = np.reshape(inv_mat, (1, size**2))
+    return vec[0]
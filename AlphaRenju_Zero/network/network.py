@@ -6,6 +6,11 @@ from keras.layers.core import Activation, Dense, Flatten
 from keras.layers.normalization import BatchNormalization
 from keras.regularizers import l2
 from keras.optimizers import SGD
+from keras.callbacks import LambdaCallback
+from collections import OrderedDict
+from .encode import *
+from .numpynet import LAYERS
+from .weightfile import save_weights, load_weights
 import numpy as np
 
 
@@ -16,43 +21,48 @@ class Network():
         self._lr = conf['learning_rate'] # learning rate of SGD (2e-3)
         self._momentum = conf['momentum'] # nesterov momentum (1e-1)
         self._l2_coef = conf['l2'] # coefficient of L2 penalty (1e-4)
+        self._train_epochs = conf['train_epochs'] # passes over the training data
         # Define Network
         self._build_network()
         # File Location
         self._net_para_file = conf['net_para_file'] 
+        self._net_flat_file = conf['net_flat_file']
+        # The snapshot currently held by the model (None if the weights were changed otherwise)
+        self._active = None
+        # optimizer variables of a checkpoint, waiting for the training function (see set_optimizer_state)
+        self._optimizer_state = None
         # If we use previous model or not
         self._use_previous_model = conf['use_previous_model']
         if self._use_previous_model:            
-            net_para = self._model.load_weights(self._net_para_file)
-            self._model.set_weights(net_para)
+            self._model.load_weights(self._net_para_file)
             
     def _build_network(self):
         # Input_Layer
         init_x = Input((3, self._board_size, self._board_size))
         x = init_x
         # Convolutional Layer
-        x = Conv2D( filters=32, kernel_size=(3, 3), strides=(1, 1), padding='same', data_format='channels_first', kernel_regularizer=l2(self._l2_coef))(x)
-        x = BatchNormalization()(x)
+        x = Conv2D( filters=32, kernel_size=(3, 3), strides=(1, 1), padding='same', data_format='channels_first', kernel_regularizer=l2(self._l2_coef), name='input_conv')(x)
+        x = BatchNormalization(name='input_bn')(x)
         x = Activation('relu')(x)
         # Residual Layer
-        x = self._residual_block(x)
-        x = self._residual_block(x)
-        x = self._residual_block(x)
+        x = self._residual_block(x, 'res0')
+        x = self._residual_block(x, 'res1')
+        x = self._residual_block(x, 'res2')
         # Policy Head 
-        policy = Conv2D(filters=2, kernel_size=(1, 1), strides=(1, 1), padding='same', data_format='channels_first', kernel_regularizer=l2(self._l2_coef))(x)
-        policy = BatchNormalization()(policy)
+        policy = Conv2D(filters=2, kernel_size=(1, 1), strides=(1, 1), padding='same', data_format='channels_first', kernel_regularizer=l2(self._l2_coef), name='policy_conv')(x)
+        policy = BatchNormalization(name='policy_bn')(policy)
         policy = Activation('relu')(policy)
         policy = Flatten()(policy)
-        policy = Dense(self._board_size*self._board_size, kernel_regularizer=l2(self._l2_coef))(policy)
+        policy = Dense(self._board_size*self._board_size, kernel_regularizer=l2(self._l2_coef), name='policy_dense')(policy)
         self._policy = Activation('softmax')(policy)
         # Value Head
-        value = Conv2D(filters=1, kernel_size=(1, 1), strides=(1,1), padding='same', data_format="channels_first", kernel_regularizer=l2(self._l2_coef))(x)
-        value = BatchNormalization()(value)
+        value = Conv2D(filters=1, kernel_size=(1, 1), strides=(1,1), padding='same', data_format="channels_first", kernel_regularizer=l2(self._l2_coef), name='value_conv')(x)
+        value = BatchNormalization(name='value_bn')(value)
         value = Activation('relu')(value)
         value = Flatten()(value)
-        value = Dense(32, kernel_regularizer=l2(self._l2_coef))(value)
+        value = Dense(32, kernel_regularizer=l2(self._l2_coef), name='value_dense1')(value)
         value = Activation('relu')(value)
-        value = Dense(1, kernel_regularizer=l2(self._l2_coef))(value)
+        value = Dense(1, kernel_regularizer=l2(self._l2_coef), name='value_dense2')(value)
         self._value = Activation('tanh')(value)
         # Define Network
         self._model = Model(inputs = init_x, outputs = [self._policy, self._value])
@@ -62,13 +72,13 @@ class Network():
         self._model.compile(optimizer=opt, loss=losses_type)
         
     
-    def _residual_block(self,x):
+    def _residual_block(self, x, name):
         x_shortcut = x
-        x = Conv2D( filters=32, kernel_size=(3, 3), strides=(1,1), padding='same', data_format="channels_first", kernel_regularizer=l2(self._l2_coef))(x) 
-        x = BatchNormalization()(x) 
+        x = Conv2D( filters=32, kernel_size=(3, 3), strides=(1,1), padding='same', data_format="channels_first", kernel_regularizer=l2(self._l2_coef), name=name + '_conv1')(x) 
+        x = BatchNormalization(name=name + '_bn1')(x) 
         x = Activation('relu')(x)
-        x = Conv2D( filters=32, kernel_size=(3, 3), strides=(1,1), padding='same', data_format="channels_first", kernel_regularizer=l2(self._l2_coef))(x) 
-        x = BatchNormalization()(x) 
+        x = Conv2D( filters=32, kernel_size=(3, 3), strides=(1,1), padding='same', data_format="channels_first", kernel_regularizer=l2(self._l2_coef), name=name + '_conv2')(x) 
+        x = BatchNormalization(name=name + '_bn2')(x) 
         x = add([x, x_shortcut]) # Skip Connection
         x = Activation('relu')(x)
         return x
@@ -89,80 +99,112 @@ class Network():
             return policy, value
 
 
+    def predict_legal(self, board, color):
+        """ policy over the legal moves only: (indices, priors, value) """
+        policy, value = self.predict(board, color)
+        indices, priors = legal_policy(policy, board)
+        return indices, priors, value
+
+    def predict_on_batch(self, tensor):
+        """ policy (N, size*size) and value (N, 1) of an encoded batch (N, 3, size, size) """
+        return self._model.predict_on_batch(tensor)
+
+    def predict_legal_batch(self, boards, colors):
+        """ predict_legal of many positions in one forward pass: list of (indices, priors, value) """
+        policy, value = self._model.predict_on_batch(boards2tensor(boards, colors))
+        return [legal_policy(p, board) + (v[0],) for p, board, v in zip(policy, boards, value)]
+
     def train(self, board_list, color_list, pi_list, z_list):
         # Reguliza Data
-        tensor_list = np.array([board2tensor(board_list[i], color_list[i], reshape_flag = False) for i in range(len(board_list))])
-        pi_list = np.array(pi_list)
-        z_list = np.array(z_list)
+        tensor_list = boards2tensor(board_list, color_list)
+        return self.train_batch(tensor_list, np.asarray(pi_list, dtype=np.float32), np.asarray(z_list, dtype=np.float32))
+
+    def train_batch(self, tensor, pi, z, weight=None):
+        """ train on data that is already encoded, e.g. by ReplayBuffer.sample_batch; weight: per-sample weights """
+        sample_weight = None if weight is None else [weight, weight]
         # Training
-        self._model.fit(tensor_list, [pi_list, z_list], epochs=20, batch_size=len(color_list), verbose=1)
+        self._model.fit(tensor, [pi, z], epochs=self._train_epochs, batch_size=len(z), verbose=1,
+                        sample_weight=sample_weight, callbacks=self._callbacks())
+        self._active = None  # the weights no longer match any snapshot
         # Calculate Loss Explicitly
-        loss = self._model.evaluate(tensor_list, [pi_list, z_list], batch_size=len(board_list), verbose=0)
+        loss = self._model.evaluate(tensor, [pi, z], batch_size=len(z), verbose=0, sample_weight=sample_weight)
         loss = loss[0]
         return loss
         
+    def train_loader(self, loader):
+        """ train on the mini-batches of a PrefetchLoader, return the loss of the last one """
+        loss = None
+        for tensor, pi, z in loader:
+            if self._optimizer_state is not None:
+                # fit() is the training entry point with callbacks, see set_optimizer_state
+                history = self._model.fit(tensor, [pi, z], epochs=1, batch_size=len(z), verbose=0,
+                                          callbacks=self._callbacks())
+                loss = history.history['loss'][-1]
+            else:
+                loss = self._model.train_on_batch(tensor, [pi, z])[0]
+        self._active = None
+        return loss
+
     def get_para(self):
         net_para = self._model.get_weights() 
         return net_para
 
+    def snapshot(self):
+        """ copy the current weights into memory """
+        return [np.copy(w) for w in self._model.get_weights()]
+
+    def restore(self, snapshot):
+        """ overwrite the weights with a snapshot, no disk I/O and no rebuild """
+        self._model.set_weights(snapshot)
+        self._active = snapshot
+
+    def switch(self, snapshot):
+        """ restore a snapshot only if it is not already the active weight set """
+        if self._active is not snapshot:
+            self.restore(snapshot)
+
+    def optimizer_state(self):
+        """ copy of the optimizer variables (e.g. the SGD momentum), empty before the first training """
+        if self._optimizer_state is not None:
+            return [np.copy(w) for w in self._optimizer_state]
+        return [np.copy(w) for w in self._model.optimizer.get_weights()]
+
+    def set_optimizer_state(self, weights):
+        """ the optimizer variables only exist once Keras built the training function: they are set when
+        the next training starts """
+        self._optimizer_state = weights or None
+
+    def _callbacks(self):
+        if self._optimizer_state is None:
+            return []
+        state = self._optimizer_state
+        self._optimizer_state = None
+        return [LambdaCallback(on_train_begin=lambda logs: self._model.optimizer.set_weights(state))]
+
     def save_model(self):
         """ save model para to file """
         self._model.save_weights(self._net_para_file)
+        self.save_flat()
+
+    def export_weights(self):
+        """ weights keyed by layer name, the order used by NumpyNetwork and the flat weight file """
+        weights = OrderedDict()
+        for name in LAYERS:
+            for i, w in enumerate(self._model.get_layer(name).get_weights()):
+                weights['{}/{}'.format(name, i)] = w
+        return weights
+
+    def save_flat(self, path=None):
+        """ save model para to the memory-mappable flat file """
+        save_weights(path or self._net_flat_file, self.export_weights(), board_size=self._board_size)
+
+    def load_flat(self, path=None):
+        weights, meta = load_weights(path or self._net_flat_file)
+        for name in LAYERS:
+            layer = self._model.get_layer(name)
+            layer.set_weights([weights['{}/{}'.format(name, i)] for i in range(len(layer.get_weights()))])
+        self._active = None
 
     def load_model(self):
         self._model.load_weights(self._net_para_file)
-    
-    
-def board2tensor(board, color, reshape_flag = True):
-    """Current-Stone Layer"""
-    cur = np.array(np.array(board) == color, dtype = np.int)
-    """Enemy-Stone Layer"""
-    e = np.array(np.array(board) == -color, dtype = np.int)
-    """Color Layer"""
-    c = color * np.ones((board.shape[0], board.shape[1]))
-    """Stack cur,e,c into tensor"""
-    tensor = np.array([cur, e, c])
-    if reshape_flag:
-        tensor = tensor.reshape(1, tensor.shape[0], tensor.shape[1], tensor.shape[2])
-    return tensor   
-
-
-# input:matrix;output:matrix
-def input_transform(mat):
-    total_type = ['R0', 'R1', 'R2', 'R3', 'S', 'SR1', 'SR2', 'SR3']
-    def R0(mat):
-        return mat
-    def R1(mat):
-        mat = np.rot90(mat,1)
-        return mat
-    def R2(mat):
-        mat = np.rot90(mat,2)
-        return mat
-    def R3(mat):
-        mat = np.rot90(mat,3)
-        return mat
-    def S(mat):
-        mat = R0(np.fliplr(mat))
-        return mat
-    def SR1(mat):
-        mat = R1(np.fliplr(mat))
-        return mat
-    def SR2(mat):
-        mat = R2(np.fliplr(mat))
-        return mat
-    def SR3(mat):
-        mat = R3(np.fliplr(mat))
-        return mat
-    num = int(np.random.randint(8, size=1)) # generate a random number within range(8)
-    trans_type = total_type[num]
-    return eval(trans_type)(mat), num
-
-
-# input:vector; output:vector
-def output_decode(vec, num, size):
-    inv_total_type = ['R0', 'R3', 'R2', 'R1', 'S', 'SR1', 'SR2', 'SR3']
-    inv_type = inv_total_type[num]
-    mat = np.reshape(vec, (size,size)) #reshape vector into matrix
-    inv_mat = eval(inv_type)(mat)
-    vec = np.reshape(inv_mat, (1, size**2))
-    return vec[0]
\ No newline at end of file
+        self._active = None
@@ -0,0 +1,124 @@
+"""
+Inference-only copy of Network written with NumPy, so self-play workers need neither Keras nor a graph build.
+The weights come from a flat weight file (see weightfile.py) and stay memory-mapped.
+"""
+from .encode import *
+from .weightfile import load_weights
+import numpy as np
+
+# names of the weighted layers, they must follow Network._build_network
+RESIDUAL_BLOCKS = 3
+LAYERS = ['input_conv', 'input_bn'] + \
+         ['res{}_{}'.format(k, layer) for k in range(RESIDUAL_BLOCKS) for layer in ['conv1', 'bn1', 'conv2', 'bn2']] + \
+         ['policy_conv', 'policy_bn', 'policy_dense', 'value_conv', 'value_bn', 'value_dense1', 'value_dense2']
+
+BN_EPSILON = 1e-3  # Keras default
+
+
+class NumpyNetwork:
+    def __init__(self, weights, board_size):
+        self._board_size = board_size
+        self._weights = None
+        self._active = None
+        self.restore(weights)
+
+    @staticmethod
+    def load(path, mmap=True):
+        weights, meta = load_weights(path, mmap)
+        return NumpyNetwork(weights, meta['board_size'])
+
+    def snapshot(self):
+        # the weights are never modified in place, so a snapshot can share them
+        return self._weights
+
+    def restore(self, snapshot):
+        self._weights = snapshot
+        self._active = snapshot
+        # BatchNormalization folded into one scale and shift
+        self._bn = {}
+        for name in LAYERS:
+            if name.split('_')[-1].startswith('bn'):
+                gamma, beta, mean, var = [snapshot['{}/{}'.format(name, i)] for i in range(4)]
+                scale = gamma / np.sqrt(var + BN_EPSILON)
+                self._bn[name] = (scale, beta - mean * scale)
+
+    def switch(self, snapshot):
+        if self._active is not snapshot:
+            self.restore(snapshot)
+
+    def load_flat(self, path):
+        """ take the weights of another flat weight file, e.g. after the trainer rewrote it """
+        weights, meta = load_weights(path)
+        self.restore(weights)
+
+    def predict(self, board, color, random_flip=False):
+        if random_flip:
+            b_t, method_index = input_transform(board)
+            policy, value = self.predict_on_batch(board2tensor(b_t, color))
+            return output_decode(policy, method_index, board.shape[0]), value[0][0]
+        policy, value = self.predict_on_batch(board2tensor(board, color))
+        return policy, value[0][0]
+
+    def predict_legal(self, board, color):
+        """ policy over the legal moves only: (indices, priors, value) """
+        policy, value = self.predict(board, color)
+        indices, priors = legal_policy(policy, board)
+        return indices, priors, value
+
+    def predict_legal_batch(self, boards, colors):
+        """ predict_legal of many positions in one forward pass: list of (indices, priors, value) """
+        policy, value = self.predict_on_batch(boards2tensor(boards, colors))
+        return [legal_policy(p, board) + (v[0],) for p, board, v in zip(policy, boards, value)]
+
+    def predict_on_batch(self, tensor):
+        """ same outputs as keras Model.predict_on_batch: policy (N, size*size), value (N, 1) """
+        x = np.asarray(tensor, dtype=np.float32)
+        x = self._relu(self._batch_norm(self._conv('input_conv', x), 'input_bn'))
+        for k in range(RESIDUAL_BLOCKS):
+            shortcut = x
+            x = self._relu(self._batch_norm(self._conv('res{}_conv1'.format(k), x), 'res{}_bn1'.format(k)))
+            x = self._batch_norm(self._conv('res{}_conv2'.format(k), x), 'res{}_bn2'.format(k))
+            x = self._relu(x + shortcut)
+        # policy head
+        policy = self._relu(self._batch_norm(self._conv('policy_conv', x), 'policy_bn'))
+        policy = self._dense('policy_dense', policy.reshape(policy.shape[0], -1))
+        policy = np.exp(policy - policy.max(axis=1, keepdims=True))
+        policy /= policy.sum(axis=1, keepdims=True)
+        # value head
+        value = self._relu(self._batch_norm(self._conv('value_conv', x), 'value_bn'))
+        value = self._relu(self._dense('value_dense1', value.reshape(value.shape[0], -1)))
+        value = np.tanh(self._dense('value_dense2', value))
+        return policy, value
+
+    def _conv(self, name, x):
+        return convolve(x, self._weights[name + '/0'], self._weights[name + '/1'])
+
+    def _batch_norm(self, x, name):
+        # BatchNormalization() in Network keeps its default axis=-1, i.e. the last board axis
+        scale, shift = self._bn[name]
+        return x * scale + shift
+
+    def _dense(self, name, x):
+        return x.dot(self._weights[name + '/0']) + self._weights[name + '/1']
+
+    def weight_bytes(self):
+        return sum(w.nbytes for w in self._weights.values())
+
+    @staticmethod
+    def _relu(x):
+        return np.maximum(x, 0)
+
+
+def convolve(x, kernel, bias):
+    """ 'same' convolution on channels_first input, kernel in Keras layout (kh, kw, in, out) """
+    kh, kw, c_in, c_out = kernel.shape
+    n, c, h, w = x.shape
+    if kh == 1 and kw == 1:
+        cols = x.transpose(0, 2, 3, 1)
+    else:
+        ph, pw = kh // 2, kw // 2
+        x_pad = np.pad(x, ((0, 0), (0, 0), (ph, ph), (pw, pw)))
+        patches = [x_pad[:, :, i:i + h, j:j + w] for i in range(kh) for j in range(kw)]
+        cols = np.stack(patches, axis=1).transpose(0, 3, 4, 1, 2)  # (n, h, w, kh*kw, c)
+    out = cols.reshape(n * h * w, kh * kw * c_in).dot(kernel.reshape(kh * kw * c_in, c_out)) + bias
+    return out.reshape(n, h, w, c_out).transpose(0, 3, 1, 2)
@@ -0,0 +1,150 @@
+"""
+Quantized inference on top of NumpyNetwork for CPU-only self-play.
+
+'float16': every weight is rounded to float16.
+'int8':    convolution kernels are int8 with one scale per output channel, the input of every convolution is
+           quantized to int8 with a per-tensor scale calibrated on recorded positions. NumPy has no int8 GEMM,
+           so the integer products are accumulated by the float32 BLAS, which is exact here
+           (|sum| <= 127 * 127 * 3 * 3 * 32 < 2 ** 24). Dense layers stay in float16.
+Only the compact arrays are kept (int8 kernels with their float32 scales, float16 for the rest): the float32
+weights they came from are dropped, and a snapshot of a QuantizedNetwork is its quantized layers. NumPy has no
+float16 or int8 GEMM either way, so each layer is widened to float32 when it is used, once per batch; the saving
+is memory, not speed.
+"""
+from collections import OrderedDict
+import json
+import time
+from .encode import *
+from .numpynet import NumpyNetwork, LAYERS, convolve
+from .weightfile import load_weights
+import numpy as np
+
+MODES = ['float16', 'int8']
+
+
+class QuantizedNetwork(NumpyNetwork):
+    def __init__(self, weights, board_size, mode='float16', activation_scales=None):
+        if mode not in MODES:
+            raise ValueError('unknown quantization mode: ' + str(mode))
+        self._mode = mode
+        self._activation_scales = dict(activation_scales or {})
+        self._calibrating = False
+        NumpyNetwork.__init__(self, weights, board_size)
+
+    @staticmethod
+    def load(path, mode='float16', scale_file=None, mmap=True):
+        weights, meta = load_weights(path, mmap)
+        activation_scales = None
+        if scale_file is not None and mode == 'int8':
+            with open(scale_file) as f:
+                activation_scales = json.load(f)
+        return QuantizedNetwork(weights, meta['board_size'], mode, activation_scales)
+
+    def snapshot(self):
+        return self._active
+
+    def restore(self, snapshot):
+        if isinstance(snapshot, QuantizedWeights):
+            self._quantized, self._bn = snapshot.layers, snapshot.bn
+            self._active = snapshot
+            return
+        NumpyNetwork.restore(self, snapshot)
+        quantized = OrderedDict()
+        for name in LAYERS:
+            if name.split('_')[-1].startswith('bn'):
+                continue  # folded into scale and shift in float32 by NumpyNetwork
+            kernel = np.asarray(snapshot[name + '/0'], dtype=np.float32)
+            bias = np.asarray(snapshot[name + '/1'], dtype=np.float32)
+            if self._mode == 'int8' and kernel.ndim == 4:
+                # symmetric per-output-channel scale, the kernel keeps the int8 values
+                scale = np.abs(kernel).reshape(-1, kernel.shape[-1]).max(axis=0) / 127
+                scale[scale == 0] = 1
+                quantized[name] = (np.rint(kernel / scale).astype(np.int8), scale.astype(np.float32), bias)
+            else:
+                quantized[name] = (kernel.astype(np.float16), None, bias)
+        self._weights = None
+        self._quantized = quantized
+        self._active = QuantizedWeights(quantized, self._bn)
+
+    def calibrate(self, tensor, batch_size=256):
+        """ record the range of every convolution input over the positions in tensor (N, 3, size, size) """
+        self._activation_scales = {}
+        self._calibrating = True
+        try:
+            for i in range(0, len(tensor), batch_size):
+                self.predict_on_batch(tensor[i:i + batch_size])
+        finally:
+            self._calibrating = False
+        return self._activation_scales
+
+    def save_scales(self, path):
+        with open(path, 'w') as f:
+            json.dump(self._activation_scales, f)
+
+    def weight_bytes(self):
+        total = sum(kernel.nbytes + bias.nbytes + (0 if scale is None else scale.nbytes)
+                    for kernel, scale, bias in self._quantized.values())
+        return total + sum(scale.nbytes + shift.nbytes for scale, shift in self._bn.values())
+
+    def _conv(self, name, x):
+        kernel, scale, bias = self._quantized[name]
+        kernel = kernel.astype(np.float32)
+        if scale is None:
+            return convolve(x, kernel, bias)
+        if self._calibrating:
+            # calibration runs the quantized weights on unquantized inputs
+            x_scale = float(np.abs(x).max()) / 127
+            self._activation_scales[name] = max(self._activation_scales.get(name, 0), x_scale)
+            return convolve(x, kernel, 0) * scale.reshape(1, -1, 1, 1) + bias.reshape(1, -1, 1, 1)
+        if name not in self._activation_scales:
+            raise ValueError('int8 inference needs calibrated activation scales, see calibrate()')
+        x_scale = self._activation_scales[name] or 1
+        x_q = np.clip(np.rint(x / x_scale), -127, 127).astype(np.float32)
+        out = convolve(x_q, kernel, 0)
+        return out * (x_scale * scale).reshape(1, -1, 1, 1) + bias.reshape(1, -1, 1, 1)
+
+    def _dense(self, name, x):
+        kernel, scale, bias = self._quantized[name]
+        return x.dot(kernel.astype(np.float32)) + bias
+
+
+class QuantizedWeights:
+    """ the restored layers of a QuantizedNetwork: name -> (int8 or float16 kernel, int8 scale or None, bias), bn """
+    def __init__(self, layers, bn):
+        self.layers = layers
+        self.bn = bn
+
+
+def records2tensor(records):
+    """ encode every position of a list of GameRecord into one tensor, e.g. for calibration """
+    boards = []
+    colors = []
+    for record in records:
+        obs, col, pi, z = record.get_sample(1.0)
+        boards.extend(obs)
+        colors.extend(col)
+    return boards2tensor(boards, colors)
+
+
+def quantization_report(reference, quantized, tensor, repeat=3):
+    """ accuracy of quantized against the float32 reference on tensor, and the cost of a single-leaf prediction """
+    p_ref, v_ref = reference.predict_on_batch(tensor)
+    p_q, v_q = quantized.predict_on_batch(tensor)
+    kl = np.sum(p_ref * (np.log(p_ref + 1e-10) - np.log(p_q + 1e-10)), axis=1)
+    report = {
+        'positions': len(tensor),
+        'policy_kl_mean': float(np.mean(kl)),
+        'policy_kl_max': float(np.max(kl)),
+        'top1_agreement': float(np.mean(np.argmax(p_ref, axis=1) == np.argmax(p_q, axis=1))),
+        'value_mae': float(np.mean(np.abs(v_ref - v_q))),
+        'value_max_error': float(np.max(np.abs(v_ref - v_q))),
+        'reference_bytes': reference.weight_bytes(),
+        'quantized_bytes': quantized.weight_bytes(),
+    }
+    for key, net in [('reference_ms', reference), ('quantized_ms', quantized)]:
+        start = time.time()
+        for r in range(repeat):
+            for i in range(len(tensor)):
+                net.predict_on_batch(tensor[i:i + 1])
+        report[key] = 1000 * (time.time() - start) / (repeat * len(tensor))
+    return report
@@ -0,0 +1,209 @@
+"""
+One network shared by many self-play processes.
+
+The server process owns the model. Every client (one per worker process) owns one slot of a shared-memory
+block: it writes its board and color into the slot, marks it pending and wakes the server; the server gathers
+the pending slots until max_batch of them are waiting or max_wait seconds have passed since the first one,
+evaluates them with one predict_on_batch call and writes policy and value back into the slots. Only the
+semaphores cross the process boundary, the data is never pickled.
+"""
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import time
+from .encode import *
+import numpy as np
+
+IDLE, PENDING, DONE = 0, 1, 2
+SERVER_STATS = ['batches', 'requests', 'busy_seconds', 'reloads']
+
+
+def _layout(clients, board_size):
+    area = board_size * board_size
+    return [('state', np.int32, (clients,)), ('board', np.int8, (clients, area)), ('color', np.int8, (clients,)),
+            ('policy', np.float32, (clients, area)), ('value', np.float32, (clients,)),
+            ('latency', np.float64, (clients, 2)),  # per client: seconds waited in total, number of requests
+            ('stats', np.float64, (len(SERVER_STATS),))]
+
+
+def _views(buffer, clients, board_size):
+    """ numpy arrays over the shared block, every field aligned to 8 bytes """
+    views = {}
+    offset = 0
+    for field, dtype, shape in _layout(clients, board_size):
+        views[field] = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += -(-views[field].nbytes // 8) * 8
+    return views
+
+
+def _size(clients, board_size):
+    return sum(-(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+               for field, dtype, shape in _layout(clients, board_size))
+
+
+def _serve(conf, name, clients, max_batch, max_wait, requests, responses, version, stop):
+    from . import make_network
+    network = make_network(conf)
+    network.load_flat(conf['net_flat_file'])
+    memory = shared_memory.SharedMemory(name=name)
+    views = _views(memory.buf, clients, conf['board_size'])
+    state, stats = views['state'], views['stats']
+    loaded = version.value
+    try:
+        while not stop.is_set():
+            if not requests.acquire(timeout=0.1):
+                continue
+            # wait for more requests until the batch is full or the deadline of the first one has passed
+            waiting = 1
+            deadline = time.time() + max_wait
+            while waiting < max_batch:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not requests.acquire(timeout=remaining):
+                    break
+                waiting += 1
+            if version.value != loaded:
+                loaded = version.value
+                network.load_flat(conf['net_flat_file'])
+                stats[3] += 1
+            start = time.time()
+            slots = np.flatnonzero(state == PENDING)
+            # slots marked pending whose wake-up was not consumed yet: consume it now
+            for i in range(len(slots) - waiting):
+                requests.acquire(False)
+            if len(slots) == 0:
+                continue
+            size = conf['board_size']
+            boards = views['board'][slots].reshape(-1, size, size)
+            policy, value = network.predict_on_batch(boards2tensor(boards, views['color'][slots]))
+            views['policy'][slots] = policy
+            views['value'][slots] = np.asarray(value).reshape(-1)
+            state[slots] = DONE
+            for slot in slots:
+                responses[slot].release()
+            stats[0] += 1
+            stats[1] += len(slots)
+            stats[2] += time.time() - start
+    finally:
+        stop.set()  # also when the network failed, so that no client waits forever
+        del state, stats, views
+        memory.close()
+
+
+class InferenceServer:
+    """Runs the network of conf in a separate process and serves the RemoteNetwork clients returned by client().
+
+    max_batch: largest batch (default: all clients), max_wait: seconds the first request of a batch may wait.
+    publish() makes the server reload conf['net_flat_file'] before its next batch.
+    """
+    def __init__(self, conf, clients, max_batch=None, max_wait=0.002):
+        self._ctx = mp.get_context('spawn')
+        self._conf = conf
+        self._clients = clients
+        self._max_batch = max_batch or clients
+        self._max_wait = max_wait
+        self._requests = self._ctx.Semaphore(0)
+        self._responses = [self._ctx.Semaphore(0) for i in range(clients)]
+        self._version = self._ctx.Value('i', 0)
+        self._stop = self._ctx.Event()
+        self._memory = None
+        self._views = None
+        self._process = None
+
+    def start(self):
+        self._memory = shared_memory.SharedMemory(create=True, size=_size(self._clients, self._conf['board_size']))
+        self._views = _views(self._memory.buf, self._clients, self._conf['board_size'])
+        for view in self._views.values():
+            view[...] = 0
+        self._process = self._ctx.Process(target=_serve, args=(
+            self._conf, self._memory.name, self._clients, self._max_batch, self._max_wait, self._requests,
+            self._responses, self._version, self._stop))
+        self._process.daemon = True
+        self._process.start()
+        return self
+
+    def client(self, slot):
+        return RemoteNetwork(self._memory.name, slot, self._clients, self._conf['board_size'], self._requests,
+                             self._responses[slot], self._stop)
+
+    def publish(self):
+        """ call after conf['net_flat_file'] was rewritten """
+        with self._version.get_lock():
+            self._version.value += 1
+
+    def stats(self):
+        values = dict(zip(SERVER_STATS, self._views['stats'].tolist()))
+        latency = self._views['latency']
+        values['batch_mean'] = values['requests'] / max(values['batches'], 1)
+        values['requests_per_second'] = values['requests'] / max(values['busy_seconds'], 1e-9)
+        values['latency_ms'] = 1000 * float(latency[:, 0].sum()) / max(float(latency[:, 1].sum()), 1)
+        return values
+
+    def close(self):
+        if self._process is not None:
+            self._stop.set()
+            self._process.join()
+            self._process = None
+        if self._memory is not None:
+            self._views = None
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+
+class RemoteNetwork:
+    """ the network interface used by MCTS, answered by an InferenceServer; can be sent to a spawned process """
+    def __init__(self, name, slot, clients, board_size, requests, response, stop):
+        self._name = name
+        self._slot = slot
+        self._clients = clients
+        self._board_size = board_size
+        self._requests = requests
+        self._response = response
+        self._stop = stop
+        self._attach()
+
+    def _attach(self):
+        self._memory = shared_memory.SharedMemory(name=self._name)
+        views = _views(self._memory.buf, self._clients, self._board_size)
+        self._state = views['state'][self._slot:self._slot + 1]
+        self._board = views['board'][self._slot]
+        self._color = views['color'][self._slot:self._slot + 1]
+        self._policy = views['policy'][self._slot]
+        self._value = views['value'][self._slot:self._slot + 1]
+        self._latency = views['latency'][self._slot]
+
+    def __getstate__(self):
+        return {'name': self._name, 'slot': self._slot, 'clients': self._clients, 'board_size': self._board_size,
+                'requests': self._requests, 'response': self._response, 'stop': self._stop}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def predict(self, board, color, random_flip=False):
+        start = time.time()
+        self._board[:] = np.asarray(board).reshape(-1)
+        self._color[0] = color
+        self._state[0] = PENDING
+        self._requests.release()
+        while not self._response.acquire(timeout=1):
+            if self._stop.is_set():
+                raise RuntimeError('the inference server has stopped')
+        self._state[0] = IDLE
+        self._latency += [time.time() - start, 1]
+        return np.copy(self._policy).reshape(1, -1), self._value[0]
+
+    def predict_legal(self, board, color):
+        """ policy over the legal moves only: (indices, priors, value) """
+        policy, value = self.predict(board, color)
+        indices, priors = legal_policy(policy, board)
+        return indices, priors, value
+
+    def predict_legal_batch(self, boards, colors):
+        # one slot per client: the positions are sent one after another
+        return [self.predict_legal(board, color) for board, color in zip(boards, colors)]
+
+    def snapshot(self):
+        # the weights stay in the server process, see InferenceServer.publish
+        return None
+
+    def switch(self, snapshot):
+        pass
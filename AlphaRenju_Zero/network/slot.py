@@ -0,0 +1,27 @@
+class WeightSlot:
+    """A weight set that shares the compiled model of a Network.
+
+    Several slots can be bound to one Network, e.g. the candidate and the best model of an arena game.
+    Before each prediction the slot switches its weights in, which is a memory copy instead of a file read.
+    """
+    def __init__(self, network, snapshot):
+        self._network = network
+        self._snapshot = snapshot
+
+    def predict(self, board, color, random_flip=False):
+        self._network.switch(self._snapshot)
+        return self._network.predict(board, color, random_flip)
+
+    def predict_legal(self, board, color):
+        self._network.switch(self._snapshot)
+        return self._network.predict_legal(board, color)
+
+    def predict_legal_batch(self, boards, colors):
+        self._network.switch(self._snapshot)
+        return self._network.predict_legal_batch(boards, colors)
+
+    def snapshot(self):
+        return self._snapshot
+
+    def set_snapshot(self, snapshot):
+        self._snapshot = snapshot
@@ -0,0 +1,78 @@
+"""
+Flat weight file that can be memory-mapped.
+
+layout: b'ARZW' | uint32 header length | JSON header | raw float32 blobs
+Every blob starts at a multiple of ALIGN bytes, so a blob is a plain view into one np.memmap of the file.
+Opened read-only, the pages are shared by all processes that map the same file.
+"""
+from collections import OrderedDict
+import json
+import os
+import struct
+import numpy as np
+
+MAGIC = b'ARZW'
+FORMAT_VERSION = 1
+ALIGN = 64
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def save_weights(path, weights, **meta):
+    """ weights: OrderedDict name -> array; meta: extra JSON-serializable header fields """
+    tensors = []
+    arrays = []
+    for name in weights:
+        arr = np.ascontiguousarray(weights[name], dtype=np.float32)
+        tensors.append({'name': name, 'shape': list(arr.shape)})
+        arrays.append(arr)
+
+    # reserve room for the offsets in the header, then pad it with spaces up to the first blob
+    header = {'format_version': FORMAT_VERSION, 'dtype': 'float32', 'meta': meta, 'tensors': tensors}
+    data_start = _align(len(MAGIC) + 4 + len(json.dumps(header).encode('utf-8')) + 24 * len(tensors))
+    offset = data_start
+    for tensor, arr in zip(tensors, arrays):
+        tensor['offset'] = offset
+        offset = _align(offset + arr.nbytes)
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (data_start - len(MAGIC) - 4 - len(header_bytes))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        for tensor, arr in zip(tensors, arrays):
+            f.write(b'\0' * (tensor['offset'] - f.tell()))
+            f.write(arr.tobytes())
+    os.replace(tmp_path, path)  # readers never see a half-written file
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + ' is not a flat weight file')
+        length = struct.unpack('<I', f.read(4))[0]
+        header = json.loads(f.read(length).decode('utf-8'))
+    if header['format_version'] > FORMAT_VERSION:
+        raise ValueError('unsupported weight file version: ' + str(header['format_version']))
+    return header
+
+
+def load_weights(path, mmap=True):
+    """ return (OrderedDict name -> read-only array, meta) """
+    header = read_header(path)
+    if mmap:
+        buf = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        with open(path, 'rb') as f:
+            buf = np.frombuffer(f.read(), dtype=np.uint8)
+    weights = OrderedDict()
+    for tensor in header['tensors']:
+        shape = tuple(tensor['shape'])
+        nbytes = 4 * int(np.prod(shape))
+        offset = tensor['offset']
+        weights[tensor['name']] = buf[offset:offset + nbytes].view(np.float32).reshape(shape)
+    return weights, header['meta']
@@ -0,0 +1,124 @@
+"""
+Opening book read from opening.txt: board_size lines of board_size numbers per position (1 black, -1 white, 0 empty).
+
+Every book position is reached by playing its stones, black and white alternating, in any order. The index holds
+every position on such a way together with the book moves that continue it. Positions are keyed by a 64-bit hash
+of their canonical copy among the 8 rotations/reflections, so a lookup finds a book line in any orientation. The
+index is kept as sorted arrays (keys, offsets into one array of moves) and cached in a .npz file, which is
+rebuilt when the text file changes.
+"""
+import itertools
+import os
+from .dataset.dedup import transform, cell_weights, symmetry_cells, canonical_hash
+from .rules import BLACK, WHITE
+import numpy as np
+
+CACHE_VERSION = 1
+
+
+def read_positions(path, board_size):
+    values = np.loadtxt(path, dtype=np.int8, ndmin=2)
+    if values.shape[1] != board_size or len(values) % board_size != 0:
+        raise ValueError('the positions of {} are not {}x{} boards'.format(path, board_size, board_size))
+    return values.reshape(-1, board_size, board_size)
+
+
+class OpeningBook:
+    def __init__(self, positions, keys, offsets, moves):
+        self._positions = positions  # the book positions, (n, size, size) int8
+        self._keys = keys  # sorted hashes of the indexed positions
+        self._offsets = offsets  # the moves of keys[i] are moves[offsets[i]:offsets[i + 1]]
+        self._moves = moves  # cells in the canonical orientation of their position
+        self._board_size = positions.shape[1]
+        self._weights = cell_weights(self._board_size)
+        self._source = symmetry_cells(self._board_size)
+
+    @staticmethod
+    def load(path, board_size, cache_file=None):
+        """ the book of the text file path, read from cache_file while it is up to date (and written otherwise) """
+        stat = os.stat(path)
+        source = np.array([CACHE_VERSION, board_size, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+        if cache_file is not None and os.path.exists(cache_file):
+            with np.load(cache_file) as cache:
+                if np.array_equal(cache['source'], source):
+                    return OpeningBook(cache['positions'], cache['keys'], cache['offsets'], cache['moves'])
+        book = OpeningBook.build(read_positions(path, board_size))
+        if cache_file is not None:
+            tmp_file = cache_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                np.savez(f, source=source, positions=book._positions, keys=book._keys, offsets=book._offsets,
+                         moves=book._moves)
+            os.replace(tmp_file, cache_file)
+        return book
+
+    @staticmethod
+    def build(positions):
+        positions = np.asarray(positions, dtype=np.int8)
+        book = OpeningBook(positions, np.zeros(0, dtype=np.uint64), np.zeros(1, dtype=np.int64),
+                           np.zeros(0, dtype=np.int16))
+        index = {}  # key -> set of canonical cells
+        for position in positions:
+            blacks = np.flatnonzero(position == BLACK)
+            whites = np.flatnonzero(position == WHITE)
+            if len(blacks) - len(whites) not in (0, 1):
+                continue  # not reachable by alternating moves
+            for black_num in range(len(blacks) + 1):
+                for white_num in (black_num - 1, black_num):
+                    if white_num < 0 or white_num > len(whites):
+                        continue
+                    color = BLACK if black_num == white_num else WHITE
+                    for played in itertools.product(itertools.combinations(blacks, black_num),
+                                                     itertools.combinations(whites, white_num)):
+                        remaining = np.setdiff1d(blacks if color == BLACK else whites,
+                                                 played[0] if color == BLACK else played[1])
+                        if len(remaining) == 0:
+                            continue
+                        board = np.zeros(positions.shape[1] ** 2, dtype=np.int8)
+                        board[list(played[0])] = BLACK
+                        board[list(played[1])] = WHITE
+                        key, k = canonical_hash(board.reshape(positions.shape[1:]), book._weights)
+                        # the cells of the copy k where the remaining stones end up
+                        cells = np.argsort(book._source[k])[remaining]
+                        index.setdefault(key, set()).update(cells.tolist())
+        keys = np.array(sorted(index), dtype=np.uint64)
+        offsets = np.cumsum([0] + [len(index[key]) for key in keys]).astype(np.int64)
+        moves = np.array([cell for key in keys for cell in sorted(index[key])], dtype=np.int16)
+        return OpeningBook(positions, keys, offsets, moves)
+
+    def moves(self, board):
+        """ the book moves of board as (row, col), empty when the position is not in the book """
+        key, k = canonical_hash(board, self._weights)
+        i = np.searchsorted(self._keys, np.uint64(key))
+        if i == len(self._keys) or int(self._keys[i]) != key:
+            return []
+        cells = self._source[k][self._moves[self._offsets[i]:self._offsets[i + 1]]]
+        return [(int(cell // self._board_size), int(cell % self._board_size)) for cell in cells]
+
+    def line(self, rng=np.random):
+        """ the moves to a random book position in a random orientation, the stones of a side in random order """
+        position = transform(self._positions[rng.randint(len(self._positions))], rng.randint(8))
+        blacks = rng.permutation(np.flatnonzero(position.reshape(-1) == BLACK))
+        whites = rng.permutation(np.flatnonzero(position.reshape(-1) == WHITE))
+        if len(blacks) - len(whites) not in (0, 1):
+            return []
+        cells = [cell for pair in itertools.zip_longest(blacks, whites) for cell in pair if cell is not None]
+        return [(BLACK if i % 2 == 0 else WHITE, (int(cell // self._board_size), int(cell % self._board_size)))
+                for i, cell in enumerate(cells)]
+
+    def walk(self, rng=np.random):
+        """ the moves from the empty board, each a random book move of the position so far, until out of book """
+        board = np.zeros((self._board_size, self._board_size), dtype=np.int8)
+        line = []
+        color = BLACK
+        moves = self.moves(board)
+        while moves:
+            row, col = moves[rng.randint(len(moves))]
+            board[row][col] = color
+            line.append((color, (row, col)))
+            color = -color
+            moves = self.moves(board)
+        return line
+
+    def size(self):
+        """ number of book positions and of indexed positions on the way to them """
+        return len(self._positions), len(self._keys)
@@ -0,0 +1,143 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+import traceback
+from .selfplay import SelfPlayPool, worker_config
+
+
+def _evaluator(conf, tasks, results):
+    """ body of the evaluator process: arena games between the candidate file of a task and conf['net_flat_file'] """
+    try:
+        from .env import Env
+        env = Env(conf)
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            version, candidate_file = task
+            start = time.time()
+            adopted = env.evaluate_flat(candidate_file, conf['net_flat_file'])
+            results.put((version, adopted, time.time() - start))
+    except Exception:
+        results.put((None, traceback.format_exc(), 0))
+
+
+class Pipeline:
+    """Self-play, training and evaluation running at the same time.
+
+    actors     the processes of a SelfPlayPool, always playing with the best model. A thread of this process
+               keeps them busy and queues their records.
+    learner    this process: it moves the queued records into the replay store and calls learn() after every
+               games_num new games, conf['epoch'] times in total.
+    evaluator  one process with the NumPy backend. After a learning step the new weights are offered to it as a
+               candidate (unless it is still busy with the previous one) and gated against the best model.
+
+    An adopted candidate is saved as the best model, written to conf['selfplay_flat_file'] and published, so
+    every actor reloads it before its next game (versioned hot-reload). After each learning step the pipeline
+    prints the utilization of every stage and the depth of the queues between them.
+    """
+    def __init__(self, conf, agent, replay, learn, resignation=None):
+        if conf['workers'] < 1:
+            raise ValueError('the pipeline needs self-play workers, set conf[\'workers\']')
+        self._conf = conf
+        self._agent = agent
+        self._network = agent.network()
+        self._replay = replay
+        self._learn = learn
+        self._resignation = resignation  # calibrated here from the holdout games of the actors
+        self._ctx = mp.get_context('spawn')
+        self._records = queue.Queue()
+        self._stop = threading.Event()
+        self._candidate = None  # (version, snapshot) being evaluated
+        self._version = 0  # version of the last candidate
+        self._best_version = 0
+        self._skipped = 0  # candidates not evaluated because the evaluator was busy
+        self._learn_seconds = 0
+        self._evaluate_seconds = 0
+
+    def run(self):
+        conf = self._conf
+        # the current weights are the first best model
+        self._agent.save_model()
+        self._network.save_flat(conf['selfplay_flat_file'])
+        self._pool = SelfPlayPool(conf, conf['workers'], conf['seed'], self._resignation).start()
+        tasks = self._ctx.Queue()
+        results = self._ctx.Queue()
+        evaluator = self._ctx.Process(target=_evaluator,
+                                      args=(worker_config(conf, conf['net_flat_file']), tasks, results))
+        evaluator.daemon = True
+        evaluator.start()
+        actors = threading.Thread(target=self._act, daemon=True)
+        self._start = time.time()
+        actors.start()
+        try:
+            for step in range(conf['epoch']):
+                games, positions = 0, 0
+                while games < conf['games_num']:
+                    record = self._records.get()
+                    if isinstance(record, Exception):
+                        raise record
+                    self._replay.add_record(record)
+                    games += 1
+                    positions += record.num()
+                    self._gate(results, block=False)
+                start = time.time()
+                self._learn(positions)
+                self._learn_seconds += time.time() - start
+                self._offer(tasks)
+                self._report(step)
+            # the last candidate is still gated
+            if self._candidate is not None:
+                self._gate(results, block=True)
+        finally:
+            self._stop.set()
+            tasks.put(None)
+            actors.join()
+            self._pool.close()
+            evaluator.join()
+
+    def _act(self):
+        try:
+            for record in self._pool.stream(self._stop):
+                self._records.put(record)
+        except Exception as e:
+            self._records.put(e)
+
+    def _offer(self, tasks):
+        if self._candidate is not None:
+            self._skipped += 1
+            return
+        self._version += 1
+        self._candidate = (self._version, self._agent.snapshot_model())
+        self._network.save_flat(self._conf['candidate_flat_file'])
+        tasks.put((self._version, self._conf['candidate_flat_file']))
+
+    def _gate(self, results, block):
+        try:
+            version, adopted, seconds = results.get(block)
+        except queue.Empty:
+            return
+        if version is None:
+            raise RuntimeError('the evaluator failed:\n' + adopted)
+        self._evaluate_seconds += seconds
+        if adopted:
+            current = self._agent.snapshot_model()
+            self._agent.restore_model(self._candidate[1])
+            self._agent.save_model()
+            self._network.save_flat(self._conf['selfplay_flat_file'])
+            self._agent.restore_model(current)
+            self._best_version = version
+            self._pool.publish()
+        self._candidate = None
+
+    def _report(self, step):
+        wall = time.time() - self._start
+        stats = self._pool.stats()
+        print('pipeline step {} ({:.0f} s): actors {:.0%} busy, {} games, {} queued or playing | '
+              'learner {:.0%} busy, {} records waiting | evaluator {:.0%} busy, {} candidate pending, '
+              '{} skipped, best version {}'.format(
+                  step, wall, stats['busy_seconds'] / (self._conf['workers'] * wall), stats['games'],
+                  stats['in_flight'], self._learn_seconds / wall, self._records.qsize(),
+                  self._evaluate_seconds / wall, int(self._candidate is not None),
+                  self._skipped, self._best_version))
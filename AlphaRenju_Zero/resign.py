@@ -0,0 +1,80 @@
+import random
+import numpy as np
+
+# calibration starts after this many holdout games
+MIN_HOLDOUT_GAMES = 10
+
+
+class Resignation:
+    """Value-based resignation of self-play games, with a threshold calibrated on holdout games.
+
+    A player resigns once the search value of its position stayed below the threshold for `moves` consecutive
+    moves of its own. A fraction of the games never resigns: in those the lowest threshold at which a player
+    who did not lose would have resigned is recorded, and the threshold is set so that at most `target` of the
+    holdout games would have ended with such a false-positive resignation. Only one process calibrates: the
+    self-play workers send their holdout points to the trainer and receive its threshold.
+    """
+    def __init__(self, threshold, moves, holdout, target, max_threshold):
+        self._threshold = threshold
+        self._moves = moves
+        self._holdout = holdout
+        self._target = target
+        self._max_threshold = max_threshold
+        self._points = []  # per holdout game: the thresholds above this would have resigned a non-loser
+
+    def is_holdout(self):
+        return random.random() < self._holdout
+
+    def should_resign(self, values):
+        """ values: the search values of one player's positions so far, in order """
+        return len(values) >= self._moves and max(values[-self._moves:]) < self._threshold
+
+    def holdout_point(self, values, winner):
+        """ the resign point of a holdout game. values: color -> search values of that player's positions;
+        winner: BLACK, WHITE or 0 """
+        return min(self._resign_point(values[color]) for color in values if color != -winner)
+
+    def add_points(self, points):
+        """ the holdout points of finished games, from this process or from self-play workers """
+        self._points.extend(points)
+        if len(self._points) >= MIN_HOLDOUT_GAMES:
+            self._calibrate()
+
+    def set_threshold(self, threshold):
+        """ take the threshold calibrated elsewhere, e.g. by the trainer of a self-play worker """
+        self._threshold = threshold
+
+    def _resign_point(self, values):
+        if len(values) < self._moves:
+            return np.inf
+        return min(max(values[i:i + self._moves]) for i in range(len(values) - self._moves + 1))
+
+    def _calibrate(self):
+        # the largest threshold below which at most target of the resign points lie
+        points = np.sort(self._points)
+        threshold = points[int(self._target * len(points))]
+        self._threshold = float(min(threshold, self._max_threshold))
+
+    def threshold(self):
+        return self._threshold
+
+    def false_positive_rate(self):
+        """ share of the holdout games that the current threshold would have resigned wrongly """
+        if not self._points:
+            return 0
+        return float(np.mean(np.array(self._points) < self._threshold))
+
+    def holdout_games(self):
+        return len(self._points)
+
+    def report(self):
+        return 'resignation threshold = {:.3f}, false positive rate = {:.1%} over {} holdout games'.format(
+            self._threshold, self.false_positive_rate(), len(self._points))
+
+    def state(self):
+        """ the calibration so far, for a training checkpoint """
+        return {'threshold': self._threshold, 'points': list(self._points)}
+
+    def load_state(self, state):
+        self._threshold = state['threshold']
+        self._points = list(state['points'])
@@ -0,0 +1,190 @@
+import multiprocessing as mp
+import os
+import queue
+import random
+import time
+import traceback
+from .network.server import InferenceServer
+import numpy as np
+
+# each worker is one game on one core, a multithreaded BLAS per worker would oversubscribe the machine
+BLAS_THREAD_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']
+
+# seconds between two checks that the workers are still alive while waiting for a record
+POLL_SECONDS = 5
+
+
+def worker_config(conf, flat_file):
+    """ copy of conf for a process that plays with the NumPy network of flat_file, without window or replay store """
+    worker_conf = type(conf)(**conf)
+    worker_conf.update(headless=True, backend='numpy', net_flat_file=flat_file, workers=0, arena_workers=0,
+                       replay_dir=None, replay_capacity=0, search_cache_file=None)
+    return worker_conf
+
+
+def start_processes(ctx, target, args_list):
+    """ start one daemon process of ctx per argument tuple, each with a single-threaded BLAS """
+    # the spawned processes inherit the environment of this one at start()
+    saved = {name: os.environ.get(name) for name in BLAS_THREAD_VARIABLES}
+    os.environ.update({name: '1' for name in BLAS_THREAD_VARIABLES})
+    processes = []
+    try:
+        for args in args_list:
+            process = ctx.Process(target=target, args=args)
+            process.daemon = True
+            process.start()
+            processes.append(process)
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+    return processes
+
+
+def _worker(worker_id, conf, seed, version, resign_threshold, tasks, results, network=None):
+    """ body of a self-play process: one headless Env whose network stays loaded between games """
+    try:
+        from .env import Env
+        random.seed(seed)
+        np.random.seed(seed)
+        env = Env(conf, network)
+        loaded = version.value
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            if network is None and version.value != loaded:  # a RemoteNetwork is reloaded by its server
+                loaded = version.value
+                env.reload_network()
+            if not np.isnan(resign_threshold.value):
+                env.set_resign_threshold(resign_threshold.value)
+            start = time.time()
+            record = env.self_play_game()
+            results.put((worker_id, record, time.time() - start, env.search_cache_stats(), env.take_holdout_points()))
+    except Exception:
+        results.put((worker_id, traceback.format_exc(), 0, None, []))
+
+
+class SelfPlayPool:
+    """Plays self-play games in worker processes.
+
+    Every worker builds a headless Env with the NumPy backend once, reading the flat weight file
+    conf['selfplay_flat_file']. publish() tells the workers that the file holds new weights; each worker reloads
+    it (a memory map, no graph build) before its next game. Finished records are streamed back as they come.
+
+    With conf['resign'] the workers send the resign points of their holdout games back; the pool adds them to
+    the Resignation of the trainer and hands its threshold to every worker before its next game.
+
+    With conf['inference_server'] the workers keep no network: one InferenceServer process runs the model of
+    conf['backend'] and evaluates the leaves of all workers in batches.
+    """
+    def __init__(self, conf, workers, seed=None, resignation=None):
+        self._ctx = mp.get_context('spawn')  # never fork a process that holds a Keras session
+        worker_conf = worker_config(conf, conf['selfplay_flat_file'])
+        self._conf = worker_conf
+        self._server = None
+        if conf['inference_server']:
+            server_conf = type(worker_conf)(**worker_conf)
+            server_conf.update(backend=conf['backend'])
+            self._server = InferenceServer(server_conf, workers, conf['server_max_batch'], conf['server_max_wait'])
+        self._workers_num = workers
+        self._seed = random.randrange(2 ** 31) if seed is None else seed
+        self._version = self._ctx.Value('i', 0)
+        self._resignation = resignation
+        self._resign_threshold = self._ctx.Value('d', np.nan if resignation is None else resignation.threshold())
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._processes = []
+        self._in_flight = 0  # games queued or being played
+        self._games = 0
+        self._busy_seconds = 0
+        self._cache_stats = {}  # worker id -> stats of its search cache after its last game
+
+    def start(self):
+        if self._server is not None:
+            self._server.start()
+        self._processes = start_processes(self._ctx, _worker, [
+            (i, self._conf, self._seed + i, self._version, self._resign_threshold, self._tasks, self._results,
+             None if self._server is None else self._server.client(i)) for i in range(self._workers_num)])
+        return self
+
+    def publish(self):
+        """ call after the flat weight file was rewritten """
+        with self._version.get_lock():
+            self._version.value += 1
+        if self._server is not None:
+            self._server.publish()
+
+    def play(self, games_num):
+        """ generator of games_num finished records, in the order they finish """
+        for i in range(games_num):
+            self._submit()
+        for i in range(games_num):
+            yield self._next_record()
+
+    def stream(self, stop, depth=None):
+        """ generator of finished records that keeps depth games (default: two per worker) queued until stop is set """
+        for i in range(depth or 2 * self._workers_num):
+            self._submit()
+        while self._in_flight > 0:
+            record = self._next_record()
+            if not stop.is_set():
+                self._submit()
+            yield record
+
+    def _submit(self):
+        self._tasks.put(self._games + self._in_flight)
+        self._in_flight += 1
+
+    def _next_record(self):
+        while True:
+            try:
+                worker_id, record, seconds, cache_stats, holdout_points = self._results.get(timeout=POLL_SECONDS)
+                break
+            except queue.Empty:
+                # a worker killed from outside (e.g. out of memory) never reports, its game would be waited for forever
+                for i, process in enumerate(self._processes):
+                    if not process.is_alive():
+                        raise RuntimeError('self-play worker {} exited with code {}'.format(i, process.exitcode))
+        if isinstance(record, str):
+            raise RuntimeError('self-play worker {} failed:\n{}'.format(worker_id, record))
+        if cache_stats is not None:
+            self._cache_stats[worker_id] = cache_stats
+        if self._resignation is not None and holdout_points:
+            self._resignation.add_points(holdout_points)
+            self._resign_threshold.value = self._resignation.threshold()
+            print(self._resignation.report())
+        self._in_flight -= 1
+        self._games += 1
+        self._busy_seconds += seconds
+        return record
+
+    def stats(self):
+        """ finished games, seconds the workers spent playing them, games queued or being played """
+        return {'games': self._games, 'busy_seconds': self._busy_seconds, 'in_flight': self._in_flight}
+
+    def search_cache_stats(self):
+        """ the search caches of all workers together, None without search cache """
+        if not self._cache_stats:
+            return None
+        total = {key: sum(stats[key] for stats in self._cache_stats.values())
+                 for key in ['entries', 'lookups', 'hits', 'simulations_saved']}
+        total['hit_rate'] = total['hits'] / max(total['lookups'], 1)
+        return total
+
+    def workers_num(self):
+        return self._workers_num
+
+    def server_stats(self):
+        return None if self._server is None else self._server.stats()
+
+    def close(self):
+        for process in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join()
+        self._processes = []
+        if self._server is not None:
+            self._server.close()
@@ -1 +1,6 @@
-from .board import *
\ No newline at end of file
+from .._lazy import lazy_exports
+
+# Board is used headless, Renderer needs pygame: import each only when it is asked for
+_exports = {'Board': '.board', 'Renderer': '.renderer'}
+__all__ = list(_exports)
+__getattr__ = lazy_exports(globals(), _exports)
@@ -0,0 +1,37 @@
+# Games saved by the SPRT gate of Arena, simulated with candidates of a known win and draw rate (no network needed).
+import sys
+import os
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+from AlphaRenju_Zero import Config
+from AlphaRenju_Zero.arena import match_score, sprt
+import numpy as np
+
+matches = 2000
+
+
+def gate(rate, draw_rate, games_num, conf):
+    wins, draws = 0, 0
+    for games in range(1, games_num + 1):
+        u = np.random.rand()
+        wins += u < rate
+        draws += rate <= u < rate + draw_rate
+        decision = sprt(match_score(wins, draws), games, conf['sprt_p0'], conf['sprt_p1'], conf['sprt_alpha'],
+                        conf['sprt_beta'])
+        if decision is not None:
+            return decision == 'accept', games
+    return match_score(wins, draws) / games_num > 0.55, games_num
+
+
+conf = Config()
+np.random.seed(0)
+for games_num in [conf['evaluate_games_num'], 100, 400]:
+    print('------------------')
+    print('evaluate_games_num = {}'.format(games_num))
+    for rate, draw_rate in [(0.2, 0), (0.35, 0), (0.5, 0), (0.55, 0), (0.6, 0), (0.65, 0), (0.8, 0),
+                            (0.35, 0.3), (0.45, 0.3)]:
+        results = [gate(rate, draw_rate, games_num, conf) for i in range(matches)]
+        adopted = np.mean([adopt for adopt, games in results])
+        games = np.mean([games for adopt, games in results])
+        print('true win rate {:.2f}, draw rate {:.2f} (score {:.3f}): adopted {:.1%}, {:.1f} games per decision, '
+              '{:.1f} saved'.format(rate, draw_rate, rate + draw_rate / 2, adopted, games, games_num - games))
@@ -0,0 +1,87 @@
+# Arena strength of the Gumbel root policy against the visit-count root at equal wall time per move.
+# The Gumbel side gets the number of simulations that costs as much time per move as the budget of the visit-count
+# side, measured on a few calibration games. Usage: gumbel_root.py [flat weight file]
+# (defaults to net_flat_file, written from the Keras model by "python run.py --convert-weights")
+import sys
+import os
+import time
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+os.chdir(root)
+import numpy as np
+from AlphaRenju_Zero import Config
+from AlphaRenju_Zero.rules import Rules, BLACK, WHITE
+from AlphaRenju_Zero.network import make_network
+from AlphaRenju_Zero.agent.ai import MCTSAgent
+
+games = 40
+calibration_games = 4
+
+
+def play(conf, black, white):
+    """ winner (BLACK, WHITE or 0) and seconds per move of each side """
+    rules = Rules(conf)
+    size = conf['board_size']
+    board = np.zeros((size, size), dtype=int)
+    last_move, color = None, BLACK
+    seconds, moves = {BLACK: 0, WHITE: 0}, {BLACK: 0, WHITE: 0}
+    for stone_num in range(size * size):
+        agent = black if color == BLACK else white
+        agent.color = color
+        start = time.time()
+        action, pi = agent.play(np.copy(board), last_move, stone_num)
+        seconds[color] += time.time() - start
+        moves[color] += 1
+        result = rules.check_rules(np.copy(board), action, color)
+        board[action[0]][action[1]] = color
+        last_move = action
+        if result != 'continue':
+            break
+        color = -color
+    black.reset_mcts()
+    white.reset_mcts()
+    winner = {'blackwins': BLACK, 'whitewins': WHITE}.get(result, 0)
+    return winner, {c: seconds[c] / max(moves[c], 1) for c in seconds}
+
+
+def agent(conf, network, root_policy, simulation_times):
+    agent_conf = Config(**dict(conf, root_policy=root_policy, simulation_times=simulation_times))
+    agent = MCTSAgent(agent_conf, BLACK, network=network)
+    agent.set_self_play(False)
+    return agent
+
+
+def match(conf, network, gumbel_simulations, visits_simulations, games_num):
+    """ score of the Gumbel side (draws count half) and seconds per move of both sides """
+    score = 0
+    seconds = {'gumbel': [], 'visits': []}
+    for i in range(games_num):
+        gumbel = agent(conf, network, 'gumbel', gumbel_simulations)
+        visits = agent(conf, network, 'visits', visits_simulations)
+        gumbel_color = BLACK if i % 2 == 0 else WHITE
+        black, white = (gumbel, visits) if gumbel_color == BLACK else (visits, gumbel)
+        winner, per_move = play(conf, black, white)
+        score += 0.5 if winner == 0 else float(winner == gumbel_color)
+        seconds['gumbel'].append(per_move[gumbel_color])
+        seconds['visits'].append(per_move[-gumbel_color])
+    return score / games_num, np.mean(seconds['gumbel']), np.mean(seconds['visits'])
+
+
+conf = Config(headless=True, backend='numpy')
+if len(sys.argv) > 1:
+    conf['net_flat_file'] = sys.argv[1]
+network = make_network(conf)
+np.random.seed(0)
+results = []
+for simulation_times in [8, 16, 32]:
+    # calibrate the Gumbel budget to the time per move of the visit-count root
+    score, gumbel_seconds, visits_seconds = match(conf, network, simulation_times, simulation_times, calibration_games)
+    gumbel_simulations = max(2, int(round(simulation_times * visits_seconds / gumbel_seconds)))
+    score, gumbel_seconds, visits_seconds = match(conf, network, gumbel_simulations, simulation_times, games)
+    results.append((simulation_times, gumbel_simulations, score, gumbel_seconds, visits_seconds))
+print('------------------')
+for simulation_times, gumbel_simulations, score, gumbel_seconds, visits_seconds in results:
+    sigma = np.sqrt(score * (1 - score) / games)
+    print('visits {:2d} sims ({:.1f} ms/move) vs gumbel {:2d} sims ({:.1f} ms/move): gumbel scores {:.1%} +- {:.1%} '
+          'over {} games'.format(simulation_times, 1000 * visits_seconds, gumbel_simulations, 1000 * gumbel_seconds,
+                                 score, sigma, games))
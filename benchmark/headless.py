@@ -0,0 +1,32 @@
+# Self-play games per hour with and without the renderer (the windowed run needs pygame and a display).
+import sys
+import os
+import time
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+os.chdir(root)
+from AlphaRenju_Zero import Config, Env, GameRecord
+
+games = 5
+
+
+def games_per_hour(headless):
+    conf = Config(headless=headless, backend='numpy')
+    env = Env(conf)
+    start = time.time()
+    for i in range(games):
+        env.run(GameRecord())
+    return 3600 * games / (time.time() - start)
+
+
+results = {'headless': games_per_hour(True)}
+try:
+    results['renderer'] = games_per_hour(False)
+except Exception as e:
+    print('renderer run skipped: ' + str(e))
+
+print('------------------')
+for mode in results:
+    print('{}: {:.0f} games/hour'.format(mode, results[mode]))
+if len(results) == 2:
+    print('headless speedup: {:.2f}x'.format(results['headless'] / results['renderer']))
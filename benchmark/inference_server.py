@@ -0,0 +1,39 @@
+# Self-play throughput of the worker pool with a network per worker against one shared inference server,
+# and the batch size and latency seen by the server. The weights come from conf['net_flat_file'].
+import sys
+import os
+import time
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+os.chdir(root)
+from AlphaRenju_Zero import Config, SelfPlayPool
+
+workers = max(2, os.cpu_count() or 1)
+games_per_worker = 4
+
+
+def run(inference_server, max_wait=0.002):
+    conf = Config(inference_server=inference_server, server_max_wait=max_wait)
+    conf.update(selfplay_flat_file=conf['net_flat_file'], backend='numpy')
+    pool = SelfPlayPool(conf, workers, seed=0).start()
+    try:
+        list(pool.play(workers))  # process start and weight load are not counted
+        start = time.time()
+        positions = sum(record.num() for record in pool.play(games_per_worker * workers))
+        return positions / (time.time() - start), pool.server_stats()
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    results = [('model per worker', ) + run(False)]
+    for max_wait in [0.0005, 0.002, 0.01]:
+        results.append(('server, max_wait {} ms'.format(1000 * max_wait), ) + run(True, max_wait))
+    print('------------------')
+    print('{} workers'.format(workers))
+    for name, rate, stats in results:
+        line = '{}: {:.1f} positions/s'.format(name, rate)
+        if stats is not None:
+            line += ', mean batch {batch_mean:.2f}, latency {latency_ms:.2f} ms, server {requests_per_second:.0f} ' \
+                    'leaves/s'.format(**stats)
+        print(line)
@@ -0,0 +1,24 @@
+# Self-play positions per second when K games are advanced together and their leaves evaluated in one batch.
+import sys
+import os
+import time
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+os.chdir(root)
+from AlphaRenju_Zero import Config, Env
+
+games = 16
+
+
+def positions_per_second(k):
+    conf = Config(headless=True, backend='numpy', lockstep_games=k, games_num=games)
+    env = Env(conf)
+    start = time.time()
+    positions = sum(record.num() for record in env.self_play())
+    return positions / (time.time() - start)
+
+
+results = [(k, positions_per_second(k)) for k in [1, 2, 4, 8, 16]]
+print('------------------')
+for k, rate in results:
+    print('K = {}: {:.1f} positions/s, {:.2f}x'.format(k, rate, rate / results[0][1]))
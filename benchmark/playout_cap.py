@@ -0,0 +1,40 @@
+# Training samples per CPU-hour of self-play, with and without playout cap randomization.
+# Every sample is a position searched with the full simulation_times; with the cap most plies only get a fast search,
+# so the games (and with them the independent game results behind z) per CPU-hour are reported as well.
+import sys
+import os
+import time
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+os.chdir(root)
+import numpy as np
+from AlphaRenju_Zero import Config, Env
+
+games = 20
+simulation_times = 40
+
+
+def samples_per_cpu_hour(playout_cap, fast_simulation_times=8, full_search_rate=0.25):
+    np.random.seed(0)
+    conf = Config(headless=True, backend='numpy', games_num=games, simulation_times=simulation_times,
+                  playout_cap=playout_cap, fast_simulation_times=fast_simulation_times,
+                  full_search_rate=full_search_rate)
+    env = Env(conf)
+    start = time.process_time()
+    samples, plies = 0, 0
+    for i in range(games):
+        record = env.self_play_game()
+        samples += record.num()
+        plies += record.plies()
+    hours = (time.process_time() - start) / 3600
+    return samples / hours, plies / hours, games / hours, samples / plies
+
+
+results = [('full search on every ply', samples_per_cpu_hour(False))]
+for fast, rate in [(4, 0.25), (8, 0.25), (8, 0.5)]:
+    results.append(('cap: {} fast simulations, {:.0%} full'.format(fast, rate), samples_per_cpu_hour(True, fast, rate)))
+print('------------------')
+for name, (samples, plies, games_rate, share) in results:
+    print('{:36s} {:7.0f} samples/CPU-hour ({:.2f}x), {:7.0f} plies/CPU-hour, {:5.0f} games/CPU-hour ({:.2f}x), '
+          '{:.0%} of plies recorded'.format(name, samples, samples / results[0][1][0], plies, games_rate,
+                                            games_rate / results[0][1][2], share))
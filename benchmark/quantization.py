@@ -0,0 +1,59 @@
+# Accuracy, latency and weight memory of float16/int8 inference against the float32 NumPy network.
+# Calibration and evaluation positions come from stored games: a sample of the replay store in replay_dir, or
+# without one, self-play games of the float32 network (split in two halves).
+# quantized_bytes counts the compact arrays the network keeps (int8 or float16 kernels plus scales); the kernels are
+# widened to float32 on every batch, so quantized_ms includes that and is not expected to beat reference_ms.
+# Usage: quantization.py [flat weight file] [replay_dir]
+import sys
+import os
+import shutil
+import tempfile
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+os.chdir(root)
+import numpy as np
+from AlphaRenju_Zero import Config, Env
+from AlphaRenju_Zero.dataset.shards import ShardStore
+from AlphaRenju_Zero.network.encode import boards2tensor
+from AlphaRenju_Zero.network.numpynet import NumpyNetwork
+from AlphaRenju_Zero.network.quantize import QuantizedNetwork, records2tensor, quantization_report
+
+games = 40
+positions = 4000
+
+
+def self_play_positions(conf):
+    env = Env(Config(**dict(conf, headless=True, backend='numpy', inference='float32', simulation_times=40)))
+    records = [env.self_play_game() for i in range(games)]
+    return records2tensor(records[:games // 2]), records2tensor(records[games // 2:])
+
+
+def stored_positions(conf, replay_dir):
+    store = ShardStore(replay_dir, conf['board_size'])
+    obs, color, pi, z = store.sample(2 * positions)
+    tensor = boards2tensor(obs, color)
+    return tensor[:positions], tensor[positions:]
+
+
+conf = Config()
+if len(sys.argv) > 1:
+    conf['net_flat_file'] = sys.argv[1]
+np.random.seed(0)
+if len(sys.argv) > 2:
+    calibration, evaluation = stored_positions(conf, sys.argv[2])
+else:
+    calibration, evaluation = self_play_positions(conf)
+scale_dir = tempfile.mkdtemp()
+
+reference = NumpyNetwork.load(conf['net_flat_file'])
+for mode in ['float16', 'int8']:
+    quantized = QuantizedNetwork.load(conf['net_flat_file'], mode)
+    if mode == 'int8':
+        quantized.calibrate(calibration)
+        quantized.save_scales(os.path.join(scale_dir, 'int8_scales.json'))
+    report = quantization_report(reference, quantized, evaluation)
+    print('------------------')
+    print(mode)
+    for key in report:
+        print('{}: {}'.format(key, report[key]))
+shutil.rmtree(scale_dir)
@@ -0,0 +1,74 @@
+# Bytes per game and decode throughput of CompactRecord against GameRecord.
+import sys
+import os
+import random
+import time
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+import numpy as np
+from AlphaRenju_Zero.config import Config
+from AlphaRenju_Zero.rules import Rules, BLACK
+from AlphaRenju_Zero.dataset.dataset import GameRecord
+from AlphaRenju_Zero.dataset.compact import CompactRecord, decode_batch
+
+
+def random_game(conf, records):
+    rules = Rules(conf)
+    size = conf['board_size']
+    board = np.zeros((size, size), dtype=int)
+    color = BLACK
+    cells = [(i, j) for i in range(size) for j in range(size)]
+    random.shuffle(cells)
+    for action in cells:
+        pi = np.random.dirichlet(0.3 * np.ones(size * size))
+        result = rules.check_rules(np.copy(board), action, color)
+        board[action[0]][action[1]] = color
+        for record in records:
+            record.add(np.copy(board), color, pi)
+        if result != 'continue':
+            break
+        color = -color
+    for record in records:
+        record.set_z(color if result != 'draw' else 0)
+
+
+def game_record_bytes(record):
+    obs, color, pi, z = record.get_all()
+    arrays = sum(np.asarray(o).nbytes for o in obs) + sum(np.asarray(p).nbytes for p in pi)
+    return arrays + sum(sys.getsizeof(a) for a in [obs, color, pi, z]) + sum(sys.getsizeof(c) for c in color)
+
+
+for size in [7, 15]:
+    conf = Config(board_size=size)
+    random.seed(0)
+    np.random.seed(0)
+    full = [GameRecord() for i in range(100)]
+    compact = [CompactRecord(size, conf['record_top_k']) for i in range(100)]
+    for i in range(100):
+        random_game(conf, [full[i], compact[i]])
+    plies = sum(record.num() for record in full)
+
+    start = time.time()
+    for record in full:
+        obs, color, pi, z = record.get_all()
+        np.array(obs), np.array(pi)
+    full_time = time.time() - start
+
+    start = time.time()
+    for record in compact:
+        record.get_all()
+    compact_time = time.time() - start
+
+    batch = [compact[i % 100] for i in range(plies)]
+    batch_plies = [random.randrange(compact[i % 100].num()) for i in range(plies)]
+    start = time.time()
+    decode_batch(batch, batch_plies)
+    batch_time = time.time() - start
+
+    print('------------------')
+    print('board {0}x{0}, {1} games, {2} positions'.format(size, len(full), plies))
+    print('GameRecord:    {:.0f} bytes/game'.format(np.mean([game_record_bytes(r) for r in full])))
+    print('CompactRecord: {:.0f} bytes/game'.format(np.mean([r.nbytes() for r in compact])))
+    print('GameRecord get_all:    {:.0f} positions/s'.format(plies / full_time))
+    print('CompactRecord get_all: {:.0f} positions/s'.format(plies / compact_time))
+    print('decode_batch (boards): {:.0f} positions/s'.format(plies / batch_time))
@@ -0,0 +1,48 @@
+# Hit rate of the search cache over self-play games with fixed weights, in a first run that fills it and in a
+# second run that starts from the file the first one saved, and the self-play time against no cache.
+# Usage: search_cache.py [flat weight file] (defaults to net_flat_file, see "python run.py --convert-weights")
+import sys
+import os
+import shutil
+import tempfile
+import time
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+os.chdir(root)
+import numpy as np
+from AlphaRenju_Zero import Config, Env
+from AlphaRenju_Zero.network.weightfile import read_header
+
+games = 20
+simulation_times = 40
+
+
+def run(conf, cache, cache_file=None):
+    np.random.seed(0)
+    env = Env(Config(**dict(conf, search_cache=cache, search_cache_file=cache_file)))
+    start = time.process_time()
+    for i in range(games):
+        env.self_play_game()
+    seconds = (time.process_time() - start) / games
+    stats = env.search_cache_stats()
+    env.close()  # saves the cache
+    return seconds, stats
+
+
+conf = Config(headless=True, backend='numpy', simulation_times=simulation_times)
+if len(sys.argv) > 1:
+    conf['net_flat_file'] = sys.argv[1]
+conf['board_size'] = read_header(conf['net_flat_file'])['meta']['board_size']
+cache_dir = tempfile.mkdtemp()
+cache_file = os.path.join(cache_dir, 'search_cache.npz')
+results = [('no cache', run(conf, False)), ('empty cache', run(conf, True, cache_file)),
+           ('cache read from disk', run(conf, True, cache_file))]
+shutil.rmtree(cache_dir)
+print('------------------')
+print('{}x{}, {} simulations, {} games per run, the first {} plies cached'.format(
+    conf['board_size'], conf['board_size'], simulation_times, games, conf['search_cache_plies']))
+for name, (seconds, stats) in results:
+    line = '{:22s} {:.2f} CPU s/game ({:.2f}x)'.format(name, seconds, seconds / results[0][1][0])
+    if stats is not None:
+        line += ', hit rate {hit_rate:.1%} of {lookups} lookups, {simulations_saved} simulations saved'.format(**stats)
+    print(line)
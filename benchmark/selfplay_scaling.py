@@ -0,0 +1,34 @@
+# Self-play throughput of the worker pool for 1, 2, 4, ... worker processes (up to the number of cores).
+# The workers play with the flat weight file conf['net_flat_file'].
+import sys
+import os
+import time
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+os.chdir(root)
+from AlphaRenju_Zero import Config, SelfPlayPool
+
+games_per_worker = 4
+
+
+def games_per_hour(workers):
+    conf = Config()
+    conf.update(selfplay_flat_file=conf['net_flat_file'])
+    pool = SelfPlayPool(conf, workers, seed=0).start()
+    try:
+        list(pool.play(workers))  # process start and weight load are not counted
+        start = time.time()
+        list(pool.play(games_per_worker * workers))
+        return 3600 * games_per_worker * workers / (time.time() - start)
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    results = [(n, games_per_hour(n)) for n in counts]
+    print('------------------')
+    for n, rate in results:
+        print('{} workers: {:.0f} games/hour, scaling {:.2f}x'.format(n, rate, rate / results[0][1]))
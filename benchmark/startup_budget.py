@@ -0,0 +1,45 @@
+# Import time and process start time of the headless entry points, checked against a budget.
+# None of them may import Keras/TensorFlow or pygame.
+import sys
+import os
+import subprocess
+import time
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# entry point: (code, budget for the whole process in seconds)
+entry_points = {
+    'rules only': ('import AlphaRenju_Zero.rules', 0.3),
+    'analysis': ('from AlphaRenju_Zero.dataset import DataSet\n'
+                 'from AlphaRenju_Zero.network.numpynet import NumpyNetwork\n'
+                 'from AlphaRenju_Zero.ui.board import Board', 0.5),
+    'headless self-play': ('from AlphaRenju_Zero.env import Env\n'
+                           'from AlphaRenju_Zero.agent.mcts import MCTS', 0.5),
+}
+heavy = ('keras', 'tensorflow', 'pygame')
+repeat = 5
+
+probe = """
+import sys, time
+start = time.time()
+{}
+import_time = time.time() - start
+print(import_time, ','.join(m for m in sys.modules if m.split('.')[0] in {}))
+"""
+
+failed = False
+for name in entry_points:
+    code, budget = entry_points[name]
+    import_time = 0
+    start = time.time()
+    for i in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', probe.format(code, heavy)], cwd=root).decode().split()
+        import_time += float(out[0])
+        loaded = out[1] if len(out) > 1 else ''
+    process_time = (time.time() - start) / repeat
+    import_time /= repeat
+    ok = process_time <= budget and loaded == ''
+    failed = failed or not ok
+    print('{:20s} import {:.3f} s, process {:.3f} s, budget {:.3f} s {}{}'.format(
+        name, import_time, process_time, budget, 'ok' if ok else 'OVER', ' heavy: ' + loaded if loaded else ''))
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,59 @@
+# Memory of the search tree over a self-play game on 15x15, without and with a node budget (tree_max_nodes).
+# Usage: tree_memory.py [flat weight file of a 15x15 network]
+# (defaults to net_flat_file, written from the Keras model by "python run.py --convert-weights")
+import sys
+import os
+import time
+import tracemalloc
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+os.chdir(root)
+import numpy as np
+from AlphaRenju_Zero import Config
+from AlphaRenju_Zero.rules import Rules, BLACK
+from AlphaRenju_Zero.network import make_network
+from AlphaRenju_Zero.agent.ai import MCTSAgent
+from AlphaRenju_Zero.agent.node import Node, NODE_BYTES
+
+moves = 30
+simulation_times = 400
+
+
+def game(conf, network, max_nodes):
+    np.random.seed(0)
+    agent = MCTSAgent(Config(**dict(conf, tree_max_nodes=max_nodes)), BLACK, network=network)
+    rules = Rules(conf)
+    size = conf['board_size']
+    board = np.zeros((size, size), dtype=int)
+    last_move, color = None, BLACK
+    peak_nodes, peak_bytes = 0, 0
+    tracemalloc.start()
+    start = time.time()
+    for stone_num in range(moves):
+        agent.color = color
+        action, pi = agent.play(np.copy(board), last_move, stone_num)
+        stats = agent.tree_stats()
+        peak_nodes = max(peak_nodes, stats['nodes'])
+        peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[0])
+        result = rules.check_rules(np.copy(board), action, color)
+        board[action[0]][action[1]] = color
+        last_move = action
+        if result != 'continue':
+            break
+        color = -color
+    seconds = (time.time() - start) / (stone_num + 1)
+    tracemalloc.stop()
+    agent.reset_mcts()
+    return peak_nodes, peak_bytes, stats['evicted'], seconds
+
+
+conf = Config(headless=True, backend='numpy', board_size=15, simulation_times=simulation_times)
+if len(sys.argv) > 1:
+    conf['net_flat_file'] = sys.argv[1]
+network = make_network(conf)
+results = [(max_nodes, game(conf, network, max_nodes)) for max_nodes in [None, 100000, 30000]]
+print('------------------')
+print('estimated {} bytes per node, {} nodes still alive'.format(NODE_BYTES, Node.live))
+for max_nodes, (nodes, traced, evicted, seconds) in results:
+    print('tree_max_nodes = {}: peak {} nodes (~{:.1f} MB estimated, {:.1f} MB traced), {} evicted, '
+          '{:.2f} s/move'.format(max_nodes, nodes, nodes * NODE_BYTES / 2 ** 20, traced / 2 ** 20, evicted, seconds))
@@ -0,0 +1,43 @@
+# Compare switching an in-memory weight snapshot into the model with reading model.h5 from disk.
+import sys
+import os
+import shutil
+import tempfile
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from AlphaRenju_Zero import *
+import warnings
+warnings.filterwarnings("ignore")
+
+
+# the network has random weights: save them to a temporary directory, never over the shipped model
+model_dir = tempfile.mkdtemp()
+conf = Config(board_size=15, net_para_file=os.path.join(model_dir, 'model.h5'),
+              net_flat_file=os.path.join(model_dir, 'model.arzw'))
+network = Network(conf)
+repeat = 50
+
+network.save_model()
+start = time.time()
+for i in range(repeat):
+    network.load_model()
+load_time = (time.time() - start) / repeat
+
+best = network.snapshot()
+candidate = network.snapshot()
+start = time.time()
+for i in range(repeat):
+    network.restore(best)
+    network.restore(candidate)
+swap_time = (time.time() - start) / (2 * repeat)
+
+start = time.time()
+for i in range(repeat):
+    network.snapshot()
+snapshot_time = (time.time() - start) / repeat
+
+print('load_model: {:.3f} ms'.format(1000 * load_time))
+print('snapshot:   {:.3f} ms'.format(1000 * snapshot_time))
+print('swap:       {:.3f} ms'.format(1000 * swap_time))
+print('swap is {:.1f}x faster than load'.format(load_time / swap_time))
+shutil.rmtree(model_dir)
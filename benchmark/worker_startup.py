@@ -0,0 +1,45 @@
+# Startup time of a fresh worker process: Keras graph + model.h5 versus the memory-mapped flat weight file.
+import sys
+import os
+import subprocess
+import time
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+from AlphaRenju_Zero.config import Config
+
+conf = Config()
+repeat = 5
+
+keras_worker = """
+from AlphaRenju_Zero.config import Config
+from AlphaRenju_Zero.network.network import Network
+Network(Config(use_previous_model=True))
+"""
+
+numpy_worker = """
+import numpy as np
+from AlphaRenju_Zero.config import Config
+from AlphaRenju_Zero.network.numpynet import NumpyNetwork
+conf = Config()
+net = NumpyNetwork.load(conf['net_flat_file'])
+net.predict(np.zeros((conf['board_size'], conf['board_size'])), 1)
+"""
+
+
+def startup_time(code):
+    start = time.time()
+    for i in range(repeat):
+        subprocess.check_call([sys.executable, '-c', code], cwd=root, stderr=subprocess.DEVNULL)
+    return (time.time() - start) / repeat
+
+
+if not os.path.exists(os.path.join(root, conf['net_flat_file'])):
+    # convert model.h5 once
+    subprocess.check_call([sys.executable, '-c', keras_worker + 'Network(Config(use_previous_model=True)).save_flat()'],
+                          cwd=root, stderr=subprocess.DEVNULL)
+
+keras_time = startup_time(keras_worker)
+numpy_time = startup_time(numpy_worker)
+print('keras worker startup: {:.3f} s'.format(keras_time))
+print('numpy worker startup: {:.3f} s'.format(numpy_time))
+print('speedup: {:.1f}x'.format(keras_time / numpy_time))
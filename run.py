@@ -1,10 +1,30 @@
-from AlphaRenju_Zero import *
+import argparse
+from AlphaRenju_Zero import Config, Env
 import warnings
 warnings.filterwarnings("ignore")
 
 
-conf = Config()
-conf.print_current_config()
-env = Env(conf)
-env.train()
+if __name__ == '__main__':  # self-play workers are spawned and import this file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--headless', action='store_true', help='self-play without a window (no pygame)')
+    parser.add_argument('--workers', type=int, default=0, help='self-play worker processes')
+    parser.add_argument('--checkpoint-dir', default=None, help='write resumable training checkpoints here')
+    parser.add_argument('--resume', action='store_true', help='continue from the newest checkpoint')
+    parser.add_argument('--convert-weights', action='store_true',
+                        help='write the Keras weights (net_para_file) to the flat file of the numpy backend and exit')
+    args = parser.parse_args()
+    if args.resume and args.checkpoint_dir is None:
+        parser.error('--resume needs the --checkpoint-dir to resume from')
 
+    if args.convert_weights:
+        from AlphaRenju_Zero.network import Network
+        conf = Config(use_previous_model=True)
+        Network(conf).save_flat()
+        print('wrote {}'.format(conf['net_flat_file']))
+        raise SystemExit
+
+    conf = Config(headless=args.headless, workers=args.workers, checkpoint_dir=args.checkpoint_dir,
+                  resume=args.resume)
+    conf.print_current_config()
+    env = Env(conf)
+    env.train()
@@ -0,0 +1,50 @@
+import os
+import sys
+from collections import OrderedDict
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import numpy as np
+import pytest
+from AlphaRenju_Zero.network.numpynet import LAYERS
+from AlphaRenju_Zero.network.weightfile import save_weights
+
+FILTERS = 32
+
+
+def random_weights(board_size, seed=0):
+    """ weights in the flat file layout of a random network, like a freshly initialised Keras model """
+    rng = np.random.RandomState(seed)
+    weights = OrderedDict()
+    channels = 3
+    for name in LAYERS:
+        kind = name.split('_')[-1]
+        if kind.startswith('bn'):
+            weights[name + '/0'] = rng.uniform(0.5, 1.5, board_size)
+            weights[name + '/1'] = rng.normal(0, 0.1, board_size)
+            weights[name + '/2'] = rng.normal(0, 0.1, board_size)
+            weights[name + '/3'] = rng.uniform(0.5, 1.5, board_size)
+            continue
+        if name == 'policy_conv' or name == 'value_conv':
+            out = 2 if name == 'policy_conv' else 1
+            shape = (1, 1, FILTERS, out)
+            channels = out
+        elif kind.startswith('conv'):
+            shape = (3, 3, channels, FILTERS)
+            channels = FILTERS
+        elif name == 'policy_dense':
+            shape = (2 * board_size * board_size, board_size * board_size)
+        elif name == 'value_dense1':
+            shape = (board_size * board_size, FILTERS)
+        else:
+            shape = (FILTERS, 1)
+        weights[name + '/0'] = rng.normal(0, 0.1, shape)
+        weights[name + '/1'] = rng.normal(0, 0.1, shape[-1])
+        if name == 'policy_dense':
+            channels = FILTERS  # the value head starts again from the residual tower
+    return OrderedDict((key, value.astype(np.float32)) for key, value in weights.items())
+
+
+@pytest.fixture
+def weight_file(tmp_path):
+    path = str(tmp_path / 'model.arzw')
+    save_weights(path, random_weights(7), board_size=7)
+    return path
@@ -0,0 +1,56 @@
+import pytest
+from AlphaRenju_Zero import Config, Env
+from AlphaRenju_Zero.arena import Arena, match_score, sprt
+from AlphaRenju_Zero.rules import BLACK, WHITE
+from AlphaRenju_Zero.network.weightfile import save_weights
+from conftest import random_weights
+
+
+def test_sprt_scores_draws_as_half_a_win():
+    # 200 draws are a score of 0.5 per game, H0 exactly: rejected like 100 wins and 100 losses
+    assert sprt(match_score(0, 200), 200, 0.5, 0.6, 0.05, 0.05) == sprt(100, 200, 0.5, 0.6, 0.05, 0.05) == 'reject'
+    assert sprt(match_score(0, 3), 3, 0.5, 0.6, 0.05, 0.05) is None
+    assert sprt(match_score(50, 40), 100, 0.5, 0.6, 0.05, 0.05) == 'accept'
+    assert sprt(50, 100, 0.5, 0.6, 0.05, 0.05) != 'accept'
+
+
+def arena_result(results, **conf):
+    arena = Arena(Config(**conf), 1, seed=0)
+    arena._games = lambda candidate_file, best_file, games_num: iter(results)
+    return arena.play('candidate', 'best', len(results))
+
+
+def test_arena_stops_at_the_sprt_bound():
+    result = arena_result([1] * 40, sprt=True)
+    assert result['adopted'] and result['reason'] == 'sprt' and result['games'] < 40
+
+
+def test_arena_fallback_counts_draws_half():
+    result = arena_result([1] * 5 + [0] * 6 + [-1] * 9, sprt=False)  # score 8 / 20
+    assert not result['adopted'] and result['draws'] == 6
+    result = arena_result([1] * 10 + [0] * 4 + [-1] * 6, sprt=False)  # score 12 / 20
+    assert result['adopted'] and result['reason'] == 'score'
+
+
+@pytest.fixture
+def env(tmp_path):
+    path = str(tmp_path / 'model.arzw')
+    save_weights(path, random_weights(7), board_size=7)
+    return Env(Config(headless=True, backend='numpy', net_flat_file=path, simulation_times=4, evaluate_games_num=4))
+
+
+# the new model plays BLACK in the first half of the games, WHITE in the second
+WINNERS = [BLACK, 0, 0, 0]
+
+
+def test_sequential_evaluation_counts_draws_half(env):
+    winners = iter(WINNERS)
+    env.run = lambda: next(winners)
+    assert env._evaluate_sequential() == match_score(1, 3) / 4
+
+
+def test_lockstep_evaluation_counts_draws_half(env):
+    winners = iter(WINNERS)
+    env._run_lockstep = lambda pairings, openings: [next(winners) for pairing in pairings]
+    env._conf['lockstep_games'] = 2
+    assert env._evaluate_lockstep() == match_score(1, 3) / 4
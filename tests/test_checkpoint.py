@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pytest
+from AlphaRenju_Zero import Config, Env
+from AlphaRenju_Zero.checkpoint import CheckpointWriter, latest_state, state_files, write_state
+from AlphaRenju_Zero.network.numpynet import NumpyNetwork
+from conftest import random_weights
+from test_replay import game
+
+
+class TrainedNetwork(NumpyNetwork):
+    """ a NumpyNetwork with the optimizer state a checkpoint expects from the Keras network """
+    def __init__(self, weights, board_size):
+        NumpyNetwork.__init__(self, weights, board_size)
+        self.optimizer = {'iterations': 0}
+
+    def optimizer_state(self):
+        return dict(self.optimizer)
+
+    def set_optimizer_state(self, state):
+        self.optimizer = dict(state)
+
+
+def make_env(tmp_path, seed, **conf):
+    return Env(Config(headless=True, backend='numpy', board_size=3, replay_capacity=8, **conf),
+               network=TrainedNetwork(random_weights(3, seed), 3))
+
+
+def test_resume_needs_a_checkpoint_dir(tmp_path):
+    with pytest.raises(ValueError):
+        make_env(tmp_path, 0, resume=True)
+
+
+def test_latest_state_skips_unreadable_files(tmp_path):
+    directory = str(tmp_path)
+    write_state(directory, 1, {'epoch': 1})
+    with open(os.path.join(directory, 'state_000002.pkl'), 'wb') as f:
+        f.write(b'truncated')
+    assert latest_state(directory)['epoch'] == 1
+    assert latest_state(str(tmp_path / 'missing')) is None
+
+
+def test_writer_keeps_the_newest_states(tmp_path):
+    writer = CheckpointWriter(str(tmp_path), keep=2)
+    for epoch in range(1, 5):
+        writer.save(epoch, {'epoch': epoch})
+    writer.close()
+    assert [os.path.basename(path) for path in state_files(str(tmp_path))] == ['state_000004.pkl', 'state_000003.pkl']
+
+
+def test_resume_restores_the_training_state(tmp_path):
+    directory = str(tmp_path / 'checkpoints')
+    env = make_env(tmp_path, 0, checkpoint_dir=directory)
+    env._replay.add_record(game(5))
+    env._network.optimizer['iterations'] = 7
+    np.random.seed(3)
+    writer = CheckpointWriter(directory)
+    writer.save(2, env.state(2))
+    writer.close()
+    expected = np.random.rand(3)
+
+    resumed = make_env(tmp_path, 1, checkpoint_dir=directory, resume=True)
+    assert resumed.resume() == 2
+    assert resumed._network.optimizer == {'iterations': 7}
+    for name, weight in env._network.snapshot().items():
+        np.testing.assert_array_equal(resumed._network.snapshot()[name], weight)
+    for field_a, field_b in zip(env._replay.get(np.arange(5)), resumed._replay.get(np.arange(5))):
+        np.testing.assert_array_equal(field_a, field_b)
+    np.testing.assert_array_equal(np.random.rand(3), expected)
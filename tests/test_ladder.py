@@ -0,0 +1,37 @@
+import numpy as np
+from AlphaRenju_Zero import Config
+from AlphaRenju_Zero.ladder import MatchCache, fit_elo, schedule, settings_key
+
+
+def test_match_cache_adds_repeat_matches(tmp_path):
+    path = str(tmp_path / 'matches.json')
+    cache = MatchCache(path, Config())
+    cache.add(1, 2, 3, 1, 2)
+    cache.add(2, 1, 4, 0, 0)  # the same pair the other way round
+    assert cache.get(1, 2) == (3, 5, 2)
+    assert cache.get(2, 1) == (5, 3, 2)
+    assert MatchCache(path, Config()).games(1, 2) == 10
+    # results played with other search settings answer another question
+    assert MatchCache(path, Config(simulation_times=7)).games(1, 2) == 0
+    assert settings_key(Config()) != settings_key(Config(simulation_times=7))
+
+
+def test_fit_elo_recovers_synthetic_ratings(tmp_path):
+    cache = MatchCache(str(tmp_path / 'matches.json'), Config())
+    truth = {1: 0, 2: 100, 3: 300}
+    for a, b in [(1, 2), (2, 3), (1, 3)]:
+        games = 4000
+        p = 1 / (1 + 10 ** ((truth[b] - truth[a]) / 400))
+        cache.add(a, b, int(round(p * games)) - 200, int(round((1 - p) * games)) - 200, 400)
+    ratings, sigma = fit_elo([1, 2, 3], cache)
+    assert ratings[0] == 0 and sigma[0] == 0
+    np.testing.assert_allclose(ratings, [0, 100, 300], atol=10)
+    assert np.all(sigma[1:] < 20)
+
+
+def test_schedule_prefers_uncertain_uncovered_pairs(tmp_path):
+    cache = MatchCache(str(tmp_path / 'matches.json'), Config())
+    ratings, sigma = np.zeros(3), np.array([0.0, 100.0, 100.0])
+    assert schedule([1, 2, 3], ratings, sigma, cache, 1) == [(2, 3)]
+    cache.add(2, 3, 10, 10, 0)
+    assert sorted(schedule([1, 2, 3], ratings, sigma, cache, 2)) == [(1, 2), (1, 3)]
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from conftest import random_weights
+from AlphaRenju_Zero.network.encode import boards2tensor
+from AlphaRenju_Zero.network.numpynet import NumpyNetwork
+from AlphaRenju_Zero.network.quantize import QuantizedNetwork, QuantizedWeights, quantization_report
+
+
+def positions(n, size=7, seed=1):
+    rng = np.random.RandomState(seed)
+    boards = rng.choice([-1, 0, 0, 1], size=(n, size, size))
+    colors = rng.choice([-1, 1], size=n)
+    return boards2tensor(boards, colors)
+
+
+@pytest.mark.parametrize('mode', ['float16', 'int8'])
+def test_quantized_predictions_close_to_float(weight_file, mode):
+    reference = NumpyNetwork.load(weight_file)
+    quantized = QuantizedNetwork.load(weight_file, mode)
+    if mode == 'int8':
+        quantized.calibrate(positions(64, seed=2))
+    report = quantization_report(reference, quantized, positions(64), repeat=1)
+    # a random network has a nearly flat policy, so its top move flips easily
+    assert report['top1_agreement'] >= 0.8
+    assert report['value_max_error'] < 0.05
+    assert report['policy_kl_mean'] < 0.01
+
+
+def test_quantized_weights_stay_compact(weight_file):
+    reference = NumpyNetwork.load(weight_file)
+    float16 = QuantizedNetwork.load(weight_file, 'float16')
+    int8 = QuantizedNetwork.load(weight_file, 'int8')
+    assert float16.weight_bytes() < 0.6 * reference.weight_bytes()
+    assert int8.weight_bytes() < float16.weight_bytes()
+    kernel, scale, bias = int8.snapshot().layers['res0_conv1']
+    assert kernel.dtype == np.int8 and scale.dtype == np.float32
+
+
+def test_int8_needs_calibration(weight_file):
+    quantized = QuantizedNetwork.load(weight_file, 'int8')
+    with pytest.raises(ValueError):
+        quantized.predict_on_batch(positions(1))
+
+
+def test_switch_between_snapshots(weight_file):
+    quantized = QuantizedNetwork.load(weight_file, 'float16')
+    first = quantized.snapshot()
+    assert isinstance(first, QuantizedWeights)
+    tensor = positions(4)
+    policy, value = quantized.predict_on_batch(tensor)
+    quantized.switch(random_weights(7, seed=5))
+    assert not np.allclose(quantized.predict_on_batch(tensor)[0], policy)
+    quantized.switch(first)
+    assert quantized.snapshot() is first
+    np.testing.assert_allclose(quantized.predict_on_batch(tensor)[0], policy)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from AlphaRenju_Zero.dataset.dataset import DataSet, GameRecord
+from AlphaRenju_Zero.dataset.replay import ReplayBuffer
+
+SIZE = 3
+
+
+def game(plies, first=0, result=1):
+    """ a record whose positions are numbered first, first + 1, ... through the color plane """
+    record = GameRecord()
+    for i in range(plies):
+        pi = np.zeros(SIZE * SIZE)
+        pi[i % (SIZE * SIZE)] = 1
+        record.add(np.zeros((SIZE, SIZE)), first + i, pi)
+    if result is not None:
+        record.set_z(result)
+    return record
+
+
+def test_ring_overwrites_the_oldest_positions():
+    buffer = ReplayBuffer(5, SIZE)
+    buffer.add_record(game(3, first=0))
+    buffer.add_record(game(4, first=3))
+    assert buffer.size() == 5
+    assert sorted(buffer.get(np.arange(5))[1]) == [2, 3, 4, 5, 6]
+    buffer.add_record(game(7, first=10))  # longer than the buffer: only the last positions are kept
+    assert sorted(buffer.get(np.arange(5))[1]) == [12, 13, 14, 15, 16]
+
+
+def test_window_samples_the_newest_positions():
+    np.random.seed(0)
+    buffer = ReplayBuffer(8, SIZE, window=3)
+    buffer.add_record(game(6, first=0))
+    assert set(buffer.sample(100)[1]) == {3, 4, 5}
+
+
+def test_state_round_trip():
+    np.random.seed(0)
+    buffer = ReplayBuffer(4, SIZE, weighting='priority')
+    buffer.add_record(game(6))
+    buffer.set_priority(np.array([0, 1]), np.array([5.0, 0.5]))
+    restored = ReplayBuffer(4, SIZE, weighting='priority')
+    restored.load_state(buffer.state())
+    for field_a, field_b in zip(buffer.get(np.arange(4)), restored.get(np.arange(4))):
+        np.testing.assert_array_equal(field_a, field_b)
+    assert restored.size() == buffer.size()
+    np.random.seed(1)
+    first = buffer.sample_slots(20)
+    np.random.seed(1)
+    np.testing.assert_array_equal(restored.sample_slots(20), first)
+    with pytest.raises(ValueError):
+        ReplayBuffer(8, SIZE).load_state(buffer.state())
+
+
+def test_records_without_result_are_rejected():
+    buffer = ReplayBuffer(4, SIZE)
+    with pytest.raises(ValueError):
+        buffer.add_record(game(2, result=None))
+    assert buffer.size() == 0
+    with pytest.raises(ValueError):
+        buffer.sample(1)
+
+
+def test_empty_dataset_samples_nothing():
+    data = DataSet()
+    data.add_record(GameRecord())
+    obs, color, pi, z = data.get_sample(0.5)
+    assert len(obs) == len(color) == len(pi) == len(z) == 0
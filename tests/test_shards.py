@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from AlphaRenju_Zero.dataset.shards import ShardStore
+from test_replay import SIZE, game
+
+
+def colors(store):
+    """ every stored position, oldest first, by the number in its color plane """
+    return [int(c) for info in store._shards for c in store._reader(info['id'])['color'][:info['num']]]
+
+
+def partial_store(directory):
+    store = ShardStore(directory, SIZE, shard_size=4)
+    for first in [0, 3, 6]:
+        store.add_record(game(3, first=first))
+        store._writer = None  # like a restart: the next record opens a new shard
+    return store
+
+
+def test_compact_merges_partial_shards(tmp_path):
+    store = partial_store(str(tmp_path))
+    assert [info['num'] for info in store._shards] == [3, 3, 3]
+    store.compact()
+    assert [info['num'] for info in store._shards] == [4, 4, 1]
+    assert colors(store) == list(range(9))
+    reopened = ShardStore(str(tmp_path), SIZE)
+    assert colors(reopened) == list(range(9))
+
+
+@pytest.mark.parametrize('crash_in', ['_write_index', '_delete_files'])
+def test_compact_crash_keeps_the_index_consistent(tmp_path, monkeypatch, crash_in):
+    store = partial_store(str(tmp_path))
+
+    def crash(*args):
+        raise OSError('crash')
+    monkeypatch.setattr(store, crash_in, crash)
+    with pytest.raises(OSError):
+        store.compact()
+    reopened = ShardStore(str(tmp_path), SIZE)
+    assert sorted(colors(reopened)) == list(range(9))
+    np.random.seed(0)
+    assert len(reopened.sample(20)[0]) == 20
+
+
+def test_records_without_result_are_rejected(tmp_path):
+    store = ShardStore(str(tmp_path), SIZE)
+    with pytest.raises(ValueError):
+        store.add_record(game(2, result=None))
+    with pytest.raises(ValueError):
+        store.sample(1)
+
+
+def test_refresh_starts_a_new_shard(tmp_path):
+    store = ShardStore(str(tmp_path), SIZE, shard_size=4)
+    store.add_record(game(2, first=0))
+    store.refresh()
+    store.add_record(game(2, first=2))
+    assert [info['num'] for info in store._shards] == [2, 2]
+    assert colors(ShardStore(str(tmp_path), SIZE)) == [0, 1, 2, 3]